@@ -0,0 +1,294 @@
+"""Load simulation for the game handlers.
+
+Runs N concurrent games through the real ``bot`` handlers against an
+in-process fake Bot and reports throughput, handler latency, chat lock
+contention, memory per active game and how fast the replies got out:
+
+    python bench.py --games 500 --players 3 --moves 40 --latency 80
+
+With ``--workers N`` the games are split by chat the way the sharded
+deployment splits them and played by N processes at once, each with its
+own copy of the bot sharing one scores database. The front's routing is
+not part of the measurement.
+
+The timed run ends once the outbound queue has drained, so the fake API
+latency shows in the send rate and delivery delay. Telegram's send limits
+are lifted unless ``--send-limits`` is given; with them a run of many
+moves takes minutes to drain.
+
+The bot is imported inside a temporary directory holding links to the
+word list and its compiled files, so the benchmark never touches the real
+scores database. The directory is removed when the run ends.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeBot:
+    """Stands in for ``telegram.Bot``: records sends and fakes API latency."""
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.username = "benchbot"
+        self.sent = 0
+        self.api_calls = 0
+
+    async def _call(self):
+        self.api_calls += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call()
+        self.sent += 1
+
+    async def get_chat(self, chat_id):
+        await self._call()
+        return SimpleNamespace(id=chat_id, first_name=f"user{chat_id}", username=None)
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._call()
+        return SimpleNamespace(status="member")
+
+
+class FakeMessage:
+    def __init__(self, chat_id, text, message_id):
+        self.chat_id = chat_id
+        self.text = text
+        self.message_id = message_id
+
+
+class Simulation:
+    def __init__(self, bot_module, fake, chats, players, moves, think, barrier=None, send_limits=False):
+        self.bot = bot_module
+        self.fake = fake
+        self.context = SimpleNamespace(bot=fake, args=[])
+        self.chats = chats
+        self.players = players
+        self.moves = moves
+        self.think = think
+        self.barrier = barrier
+        self.send_limits = send_limits
+        self.latencies = []
+        self.accepted = 0
+        self.rejected = 0
+        self._message_id = 0
+
+    def update(self, chat_id, user, text):
+        self._message_id += 1
+        return SimpleNamespace(
+            effective_chat=SimpleNamespace(id=chat_id, type="group"),
+            effective_user=user,
+            message=FakeMessage(chat_id, text, self._message_id),
+        )
+
+    def user(self, chat_id, seat):
+        user_id = chat_id * 100 + seat
+        return SimpleNamespace(id=user_id, first_name=f"P{user_id}", username=None)
+
+    async def setup_game(self, chat_id):
+        bot = self.bot
+        await bot.startclassic(self.update(chat_id, self.user(chat_id, 0), "/startclassic"), self.context)
+        for seat in range(self.players):
+            await bot.join(self.update(chat_id, self.user(chat_id, seat), "/join"), self.context)
+        # Skip the join window
+        bot.active_games[chat_id].join_timer.cancel()
+        await bot.start_joining(chat_id, self.fake)
+
+    def pick_word(self, game):
+        min_length, _ = game.get_round_params()
+        for _ in range(20):
+            word = game.lexicon.random_word(min_length, first=game.current_word[-1])
+            if word is None:
+                break
+            if word not in game.used_words:
+                return word
+        return "x"
+
+    async def play(self, chat_id):
+        bot = self.bot
+        for _ in range(self.moves):
+            game = bot.active_games.get(chat_id)
+            if not game or game.state != 'playing':
+                return
+            player = game.players[game.current_player_index]
+            word = self.pick_word(game)
+            before = len(game.used_words)
+            start = time.perf_counter()
+            await bot.handle_message(self.update(chat_id, player, word), self.context)
+            self.latencies.append(time.perf_counter() - start)
+            if len(game.used_words) > before:
+                self.accepted += 1
+            else:
+                self.rejected += 1
+            if self.think:
+                await asyncio.sleep(random.uniform(0, 2 * self.think))
+
+    async def run(self):
+        # Simulated players type far faster than the flood limits allow
+        self.bot.flood.enabled = False
+        # Load the word list and its indexes before measuring, as start-up does
+        await self.bot.lexicons.get(self.bot.config.DEFAULT_LANGUAGE)
+        outbound = self.bot.outbound
+        if not self.send_limits:
+            outbound.chat_rate = outbound.chat_burst = 1e9
+            outbound.global_bucket = self.bot.TokenBucket(1e9, 1e9)
+        tracemalloc.start()
+        base = tracemalloc.take_snapshot()
+        await asyncio.gather(*(self.setup_game(chat_id) for chat_id in self.chats))
+        grown = tracemalloc.take_snapshot().compare_to(base, 'filename')
+        tracemalloc.stop()
+        await outbound.drain()
+        per_game = sum(stat.size_diff for stat in grown) / max(len(self.chats), 1)
+
+        if self.barrier:
+            # Start playing only once every worker has set up its games
+            await asyncio.to_thread(self.barrier.wait)
+        locks = self.bot.chat_lock
+        locks.acquired, locks.wait_seconds, locks.hold_seconds = 0, 0.0, 0.0
+        sent_before = self.fake.sent
+        delivered, delayed = outbound.delivered, outbound.delay_seconds
+        start = time.perf_counter()
+        await asyncio.gather(*(self.play(chat_id) for chat_id in self.chats))
+        played = time.perf_counter() - start
+        await outbound.drain()
+        elapsed = time.perf_counter() - start
+
+        return {
+            'per_game': per_game,
+            'played': played,
+            'elapsed': elapsed,
+            'locks': (locks.acquired, locks.wait_seconds, locks.hold_seconds),
+            'timers': len(self.bot.timers),
+            'queued': len(outbound),
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'latencies': self.latencies,
+            'sent': self.fake.sent - sent_before,
+            'delivered': outbound.delivered - delivered,
+            'delay': outbound.delay_seconds - delayed,
+        }
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def simulate(args, workdir, chats, seed, barrier=None):
+    random.seed(seed)
+    os.chdir(workdir)
+    sys.path.insert(0, HERE)
+    import bot
+
+    fake = FakeBot(args.latency / 1000, args.jitter / 1000)
+    sim = Simulation(bot, fake, chats, args.players, args.moves, args.think / 1000, barrier, args.send_limits)
+    return asyncio.run(sim.run())
+
+
+def run_shard(args, workdir, chats, seed, barrier, results):
+    results.put(simulate(args, workdir, chats, seed, barrier))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--moves", type=int, default=30, help="moves per game")
+    parser.add_argument("--latency", type=float, default=50, help="fake API latency in ms")
+    parser.add_argument("--jitter", type=float, default=20, help="extra random latency in ms")
+    parser.add_argument("--think", type=float, default=0, help="mean player think time in ms")
+    parser.add_argument("--workers", type=int, default=1, help="processes to shard the games over")
+    parser.add_argument("--send-limits", action="store_true",
+                        help="keep Telegram's per-chat and global send limits")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Compile the word list and its suggestion index where the bot keeps
+    # them, so runs and workers map the same files instead of rebuilding
+    sys.path.insert(0, HERE)
+    import fuzzy
+    import lexicon
+    words = lexicon.load(os.path.join(HERE, "words.txt"))
+    fuzzy.load(words, os.path.join(HERE, "words.bin"))
+
+    workdir = tempfile.mkdtemp(prefix="wordchain-bench-")
+    try:
+        for name in ("words.txt", "words.bin", "words.fuzzy", "words.stats.npz"):
+            if os.path.exists(os.path.join(HERE, name)):
+                os.symlink(os.path.join(HERE, name), os.path.join(workdir, name))
+        parts = run(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report(args, parts)
+
+
+def run(args, workdir):
+    chats = [-1000 - i for i in range(args.games)]
+    if args.workers > 1:
+        from shards import shard_of
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(args.workers)
+        results = context.Queue()
+        workers = [
+            context.Process(target=run_shard, args=(
+                args, workdir, [c for c in chats if shard_of(c, args.workers) == index],
+                args.seed + index, barrier, results))
+            for index in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        parts = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        return parts
+    return [simulate(args, workdir, chats, args.seed)]
+
+
+def report(args, parts):
+    accepted = sum(p['accepted'] for p in parts)
+    rejected = sum(p['rejected'] for p in parts)
+    moves = accepted + rejected
+    played = max(p['played'] for p in parts)
+    elapsed = max(p['elapsed'] for p in parts)
+    acquired, waited, held = (sum(p['locks'][i] for p in parts) for i in range(3))
+    ms = [t * 1000 for p in parts for t in p['latencies']]
+    per_game = sum(p['per_game'] for p in parts) / len(parts)
+    print(f"games            {args.games} x {args.players} players, {args.moves} moves each")
+    if args.workers > 1:
+        print(f"workers          {args.workers} processes")
+    print(f"fake latency     {args.latency:.0f}ms + up to {args.jitter:.0f}ms")
+    print(f"moves            {moves} ({accepted} accepted, {rejected} rejected)")
+    print(f"throughput       {moves / max(played, 1e-9):.0f} moves/s over {played:.2f}s, "
+          f"{elapsed:.2f}s until every reply was sent")
+    print(f"handler latency  p50 {percentile(ms, 50):.3f}ms  p99 {percentile(ms, 99):.3f}ms  "
+          f"max {max(ms, default=float('nan')):.3f}ms")
+    print(f"chat locks       {acquired} acquisitions, wait {waited * 1000:.1f}ms total "
+          f"({waited / max(acquired, 1) * 1e6:.1f}us avg), hold {held / max(acquired, 1) * 1e6:.1f}us avg")
+    print(f"memory           {per_game / 1024:.1f} KiB per active game")
+    sent = sum(p['sent'] for p in parts)
+    delivered = sum(p['delivered'] for p in parts)
+    delay = sum(p['delay'] for p in parts)
+    print(f"outbound         {delivered} messages in {sent} sends, {sent / max(elapsed, 1e-9):.0f} sends/s, "
+          f"{sum(p['queued'] for p in parts)} left queued")
+    print(f"delivery delay   {delay / max(delivered, 1) * 1000:.1f}ms avg from queued to sent")
+    print(f"pending timers   {sum(p['timers'] for p in parts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,112 @@
-import json
 import asyncio
-from telegram import Update,InlineKeyboardButton,InlineKeyboardMarkup
+import logging
+import math
+import time
+from collections import OrderedDict
+from telegram import Update,InlineKeyboardButton,InlineKeyboardMarkup,User
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters,CallbackContext
-import random
 from telegram.helpers import escape_markdown
 from telegram import BotCommand
+import lexicon as lexicon_store
+from scorestore import open_store
+from profiles import ProfileCache
+from dispatcher import Dispatcher, TokenBucket
+from timers import TimerWheel
+from chatlocks import ChatLocks, TimedLock
+import config
+import metrics
+from metrics import Counter, Gauge, call_api, timed
+from snapshots import SnapshotLog
+from movelog import MoveLog
+from flood import FloodControl
+import shards
+
+logger = logging.getLogger(__name__)
 
 # ✅ Bot Owner & Sudo Users
 BOT_OWNER_ID = 7589421463  # Replace with your Telegram ID
 SUDO_USERS = [8170921465, 6939761445, 8037102614]  # Add more user IDs as sudo users
 
-with open('words.txt', 'r', encoding='utf-8') as f:
-    valid_words = set(word.strip() for word in f if word.strip())
-
-score_lock = asyncio.Lock()
-try:
-    with open('score.json', 'r') as f:
-        scores = json.load(f)
-except FileNotFoundError:
-    scores = {}
-
+# Word lists per language, compiled on first use (or by `python lexicon.py`)
+# and mmap'd read-only. English is words.txt, others lexicons/<code>.txt.
+lexicons = lexicon_store.LexiconPacks(
+    config.LEXICON_DIR, config.LEXICON_BUDGET_MB << 20, sources={"en": "words.txt"},
+    stats=config.DIFFICULTY == "adaptive",
+)
+
+# Trophies live in memory and are flushed to scores.db in batches
+score_store = open_store('scores.db', legacy_json='score.json')
+
+# Display names for the leaderboard, filled in by the handlers players use
+profiles = ProfileCache()
+# (window, chat or None) -> (top entries, rendered body), least recently
+# used first; group boards would otherwise add an entry per chat forever
+leaderboard_cache = OrderedDict()
+LEADERBOARD_CACHE_SIZE = 1000
+
+# Game state of a chat is only touched while holding that chat's lock.
+# game_lock guards adding and removing entries in active_games and is never
+# held across a network call.
 active_games = {}
-game_lock = asyncio.Lock()
+game_lock = TimedLock()
+chat_lock = ChatLocks()
+
+# Limits how fast words reach a game and how often rejections are answered
+flood = FloodControl(
+    config.FLOOD_USER_RATE, config.FLOOD_USER_BURST,
+    config.FLOOD_CHAT_RATE, config.FLOOD_CHAT_BURST,
+    notice_window=config.FLOOD_NOTICE_WINDOW,
+)
+
+# chat_id -> id of the player on turn, only for games being played. Read
+# by the OnTurn filter before dispatch, so plain dict operations only.
+# Sharded workers replace it with one that reports changes to the front.
+current_turns = {}
+
+# All game messages are queued here and sent by per-chat workers
+outbound = Dispatcher(
+    config.OUTBOUND_CHAT_RATE, config.OUTBOUND_CHAT_BURST,
+    config.OUTBOUND_GLOBAL_RATE, config.OUTBOUND_GLOBAL_BURST,
+)
+
+# Turn deadlines and join windows of every game
+timers = TimerWheel()
+
+# Every game change is appended here so running games survive a restart
+snapshots = SnapshotLog(config.SNAPSHOT_PATH)
+
+# Every move and game event, for `python movelog.py`
+moves = MoveLog(config.MOVE_LOG_DIR, rotate_bytes=config.MOVE_LOG_ROTATE_MB << 20)
+
+def count_games_by_state():
+    counts = {}
+    for game in active_games.values():
+        counts[(game.state,)] = counts.get((game.state,), 0) + 1
+    return counts
+
+def lock_totals(attr):
+    return {("game",): getattr(game_lock, attr), ("chat",): getattr(chat_lock, attr)}
+
+WORDS = Counter("wordchain_words_total", "Words submitted, by result", ["result"])
+GAMES = Counter("wordchain_games_total", "Game lifecycle events", ["event"])
+ELIMINATIONS = Counter("wordchain_eliminations_total", "Players timed out, by stage", ["stage"])
+Gauge("wordchain_active_games", "Games in progress, by state", ["state"], fn=count_games_by_state)
+Gauge("wordchain_active_players", "Players in running games",
+      fn=lambda: sum(len(g.players) for g in active_games.values()))
+Gauge("wordchain_pending_timers", "Timers waiting on the wheel", fn=lambda: len(timers))
+Gauge("wordchain_lexicon_bytes", "Size of loaded word lists", ["language"], fn=lexicons.sizes)
+Counter("wordchain_lexicon_loads_total", "Word lists loaded", fn=lambda: lexicons.loads)
+Gauge("wordchain_outbound_backlog", "Messages queued or being sent", fn=lambda: len(outbound))
+Gauge("wordchain_score_pending", "Users with unflushed trophies", fn=lambda: score_store.pending)
+Gauge("wordchain_leaderboards", "Period and group leaderboards in memory", fn=lambda: len(score_store.boards.boards))
+Counter("wordchain_score_flushes_total", "Score batches written", fn=lambda: score_store.flushes)
+Counter("wordchain_score_flush_seconds_total", "Time spent writing scores", fn=lambda: score_store.flush_seconds)
+Counter("wordchain_words_dropped_total", "Words dropped by flood control, by limit", ["limit"], fn=lambda: flood.dropped)
+Counter("wordchain_rejections_unanswered_total", "Rejected words not replied to", fn=lambda: flood.suppressed)
+Counter("wordchain_move_log_events_total", "Game events written to the move log", fn=lambda: moves.written)
+Counter("wordchain_lock_acquisitions_total", "Lock acquisitions", ["lock"], fn=lambda: lock_totals("acquired"))
+Counter("wordchain_lock_wait_seconds_total", "Time spent waiting for locks", ["lock"], fn=lambda: lock_totals("wait_seconds"))
+Counter("wordchain_lock_hold_seconds_total", "Time locks were held", ["lock"], fn=lambda: lock_totals("hold_seconds"))
 
 async def set_bot_commands(application):
     commands = [
@@ -34,10 +119,35 @@ async def set_bot_commands(application):
         BotCommand("rules", "View game rules"),
         BotCommand("reset", "Reset scores (admin only)"),
     ]
-    await application.bot.set_my_commands(commands)
+    await call_api("setMyCommands", application.bot.set_my_commands(commands))
+
+
+async def discard_game(game):
+    async with game_lock:
+        if active_games.get(game.chat_id) is game:
+            del active_games[game.chat_id]
+            current_turns.pop(game.chat_id, None)
+            flood.forget(game.chat_id)
+            snapshots.forget(game.chat_id)
+    game.cancel_timers()
+
+
+async def settle_game(game):
+    # Called after a change to the game, once its chat lock is released
+    if game.state == 'ended':
+        await discard_game(game)
+    else:
+        snapshots.mark(game)
 
 
 class GameState:
+    """State of one chat's game.
+
+    Methods that change the state are plain functions: they must be called
+    with the chat's lock held and only queue their messages on ``outbound``,
+    so no lock is ever held across a Telegram API call.
+    """
+
     INCREMENT_SEQUENCE = [
         (5, 3, 35),   # Stage 0: 10 words, min_length 3, timeout 60
         (5, 4, 30),   # Stage 1: 10 words, min_length 4, timeout 50
@@ -46,32 +156,93 @@ class GameState:
         (None, 7, 15)  # Stage 4: until game ends, min_length 7, timeout 20
     ]
 
-    def __init__(self, chat_id, bot):
+    def __init__(self, chat_id, bot, language, lexicon):
         self.chat_id = chat_id
         self.bot = bot
+        self.language = language
+        self.lexicon = lexicon
+        # Adaptive difficulty derives the stages from the word list itself
+        self.sequence = lexicon.stats.stages(self.INCREMENT_SEQUENCE) if lexicon.stats else self.INCREMENT_SEQUENCE
+        self.playable = lexicon_store.PlayableWords(lexicon, [m for _, m, _ in self.sequence])
         self.players = []
         self.used_words = set()
         self.increment_stage = 0
         self.words_played_in_stage = 0
         self.current_player_index = 0
         self.current_word = None
-        self.timer_task = None
+        self.words_played = 0
+        self.started_at = None  # wall clock, survives a restart
+        self.turn_started = None
+        self.turn_timer = None
         self.state = 'joining'
-        self.join_task = None
-
-    async def start_game(self):
+        self.join_timer = None
+
+    def say(self, text, **kwargs):
+        outbound.send(self.bot, self.chat_id, text, **kwargs)
+
+    def cancel_timers(self):
+        for timer in (self.turn_timer, self.join_timer):
+            if timer:
+                timer.cancel()
+
+    def snapshot(self):
+        def remaining(timer):
+            return timer.remaining() if timer and timer.active else None
+
+        return {
+            'language': self.language,
+            'players': [{'id': p.id, 'first_name': p.first_name, 'username': p.username} for p in self.players],
+            'used_words': list(self.used_words),
+            'increment_stage': self.increment_stage,
+            'words_played_in_stage': self.words_played_in_stage,
+            'current_player_index': self.current_player_index,
+            'current_word': self.current_word,
+            'words_played': self.words_played,
+            'started_at': self.started_at,
+            'state': self.state,
+            'turn_remaining': remaining(self.turn_timer),
+            'join_remaining': remaining(self.join_timer),
+        }
+
+    @classmethod
+    def restore(cls, chat_id, bot, data, lexicon):
+        # Deadlines resume with the time that was left when the snapshot
+        # was taken; the restart itself is not charged to the player
+        game = cls(chat_id, bot, data['language'], lexicon)
+        game.players = [User(p['id'], p['first_name'], False, username=p['username']) for p in data['players']]
+        game.used_words = set(data['used_words'])
+        for word in game.used_words:
+            game.playable.use(word)
+        game.increment_stage = data['increment_stage']
+        game.words_played_in_stage = data['words_played_in_stage']
+        game.current_player_index = data['current_player_index']
+        game.current_word = data['current_word']
+        game.words_played = data.get('words_played', 0)
+        game.started_at = data.get('started_at')
+        game.turn_started = time.monotonic()
+        game.state = data['state']
+        if data['turn_remaining'] is not None and game.state == 'playing':
+            player = game.players[game.current_player_index]
+            game.turn_timer = timers.schedule(data['turn_remaining'], game.handle_timeout, player.id)
+            current_turns[chat_id] = player.id
+        if data['join_remaining'] is not None and game.state == 'joining':
+            game.join_timer = timers.schedule(data['join_remaining'], start_joining, chat_id, bot)
+        return game
+
+    def start_game(self):
         min_length, timeout = self.get_round_params()
-        valid_start_words = [w for w in valid_words if len(w) >= min_length]
-        self.current_word = random.choice(valid_start_words).lower()
-        self.used_words.add(self.current_word)
+        self.use_word(self.pick_start_word(min_length))
         current_stage = self.increment_stage + 1
-        
+        if self.started_at is None:
+            self.started_at = time.time()
+        moves.record('start', self.chat_id, word=self.current_word, language=self.language,
+                     players=len(self.players), stage=current_stage)
+
         escaped_word = escape_markdown(self.current_word.upper(), version=2)
         last_char = escape_markdown(self.current_word[-1].upper(), version=2)
         used_words_list = [escape_markdown(w, version=2) for w in list(self.used_words)[-3:]]
 
-        await self.bot.send_message(
-            self.chat_id,
+        self.say(
             f"✨🔥 *WORD CHAIN BATTLE COMMENCES\\!* 🔥✨\n\n\n"
             f"🗝️ *Starting Word:* `{escaped_word}`\n\n"
             f"📜 *Round {current_stage} Rules:*\n\n"
@@ -82,14 +253,22 @@ class GameState:
             "🔹━━━━━━━━━━━━━━━━━━━━🔹\n",
             parse_mode="MarkdownV2"
         )
-        await self.next_turn()
-
-    async def announce_new_stage(self):
+        self.next_turn()
+
+    def pick_start_word(self, min_length):
+        word = None
+        if self.lexicon.stats:
+            # End on a letter that leaves the next players plenty of moves
+            letter = self.lexicon.stats.start_letter(min_length)
+            if letter:
+                word = self.lexicon.random_word(min_length, last=letter)
+        return (word or self.lexicon.random_word(min_length)).lower()
+
+    def announce_new_stage(self):
         min_length, timeout = self.get_round_params()
         current_stage = self.increment_stage + 1
 
-        await self.bot.send_message(
-            self.chat_id,
+        self.say(
             f"🚀🚀 *ADVANCING TO STAGE {current_stage}* 🚀🚀\n\n"
             f"⚡ *New Parameters:*\n"
             f"📏 *Min Length:* `{min_length}` letters\n"
@@ -98,169 +277,248 @@ class GameState:
             parse_mode="MarkdownV2"
         )
 
-    async def next_turn(self):
+    def next_turn(self):
         if len(self.players) == 1:
-            await self.end_game(self.players[0])
+            self.end_game(self.players[0])
             return
 
-        if self.timer_task and not self.timer_task.done():
-            self.timer_task.cancel()
+        if self.turn_timer:
+            self.turn_timer.cancel()
 
         min_length, timeout = self.get_round_params()
+        if self.current_word and not self.playable.left(self.current_word[-1], min_length):
+            if not self.restart_chain(min_length):
+                self.end_exhausted()
+                return
         player = self.players[self.current_player_index]
+        self.announce_turn(player, timeout)
+
+        self.turn_started = time.monotonic()
+        self.turn_timer = timers.schedule(timeout, self.handle_timeout, player.id)
+        current_turns[self.chat_id] = player.id
+
+    def announce_turn(self, player, time_left):
+        min_length, _ = self.get_round_params()
         current_stage = self.increment_stage + 1
-        
+
         # Escape all dynamic content
         escaped_name = escape_markdown(format_name(player), version=2)
         required_letter = escape_markdown(self.current_word[-1].upper(), version=2) if self.current_word else "ANY"
+        words_left = self.playable.left(self.current_word[-1], min_length) if self.current_word else "?"
 
-        await self.bot.send_message(
-            self.chat_id,
+        self.say(
             f"🌀 *{escaped_name}'S TURN\\!* 🌀\n\n"
             f"⚡ Stage {current_stage}:\n"
-            f"⌛ Timeout: {timeout}s\n"
+            f"⌛ Timeout: {time_left}s\n"
             f"📏 Min Length: {min_length} letters\n"
-            f"🔗 Must Start With: '{required_letter}'\n\n",
+            f"🔗 Must Start With: '{required_letter}'\n"
+            f"📚 Words Left: {words_left}\n\n",
+            parse_mode="MarkdownV2"
+        )
+
+    def use_word(self, word):
+        self.used_words.add(word)
+        self.playable.use(word)
+        self.current_word = word
+
+    def restart_chain(self, min_length):
+        # No unused word continues the chain, so nobody can be blamed for
+        # missing the turn: carry on from a fresh word instead
+        word = self.fresh_word(min_length)
+        if word is None:
+            return False
+        GAMES.inc("dead_end")
+        moves.record('dead_end', self.chat_id, letter=self.current_word[-1], word=word,
+                     stage=self.increment_stage + 1)
+        dead_letter = escape_markdown(self.current_word[-1].upper(), version=2)
+        self.use_word(word)
+        self.say(
+            f"🧱 *No words left starting with {dead_letter}\\!*\n"
+            f"🔄 The chain continues from `{escape_markdown(word.upper(), version=2)}`",
             parse_mode="MarkdownV2"
         )
+        return True
 
-        self.timer_task = asyncio.create_task(self.handle_timeout(timeout, player.id))
+    def fresh_word(self, min_length):
+        """An unused word that the next player can still continue, or ``None``
+        if the word list has run out."""
+        def playable(word):
+            # Playing the word uses it up, so it can't be its own continuation
+            return (word not in self.used_words
+                    and self.playable.left(word[-1], min_length) > (word[0] == word[-1]))
+
+        for _ in range(20):
+            word = self.lexicon.random_word(min_length)
+            if word and playable(word):
+                return word
+        # Late in a long game most random picks are taken: walk the word
+        # list instead, skipping letters that have nothing unused left
+        lexicon = self.lexicon
+        for letter, (_, end, starts) in lexicon.buckets().items():
+            if not self.playable.left(letter, min_length):
+                continue
+            for i in range(starts[min(min_length, lexicon.max_length + 1)], end):
+                word = lexicon.word(i)
+                if playable(word):
+                    return word
+        return None
+
+    def end_exhausted(self):
+        # Nothing is left to continue from, so nobody wins or loses
+        self.state = 'ended'
+        self.cancel_timers()
+        current_turns.pop(self.chat_id, None)
+        GAMES.inc("exhausted")
+        moves.record('exhausted', self.chat_id, moves=self.words_played,
+                     stage=self.increment_stage + 1)
+        self.say(
+            "📚 *The word list is used up\\!*\n"
+            "🤝 No words can continue the chain, so the game ends in a draw\\.",
+            parse_mode="MarkdownV2"
+        )
 
-    async def process_word(self, user, word):
+    def check_word(self, word):
+        """Return why ``word`` can't be played now, or "accepted"."""
         min_length, _ = self.get_round_params()
-        word_lower = word.strip().lower()
+        if len(word) < min_length:
+            return "too_short"
+        if word not in self.lexicon:
+            return "unknown"
+        if word in self.used_words:
+            return "used"
+        if self.current_word and not word.startswith(self.current_word[-1]):
+            return "wrong_letter"
+        return "accepted"
+
+    def suggest(self, word):
+        """Valid, unused words close to a rejected ``word``."""
+        if self.lexicon.suggestions is None or not self.current_word:
+            return []
+        min_length, _ = self.get_round_params()
+        return self.lexicon.suggestions.suggest(
+            word, first=self.current_word[-1], min_length=min_length, exclude=self.used_words
+        )
 
-        # Validation checks
-        if len(word_lower) < min_length:
-            return False
-        if word_lower not in valid_words:
-            return False
-        if word_lower in self.used_words:
-            return False
-        if self.current_word and not word_lower.startswith(self.current_word[-1]):
-            return False
+    def process_word(self, user, word):
+        """Play ``word``; returns "accepted" or the check it failed."""
+        word_lower = word.strip().lower()
+        result = self.check_word(word_lower)
+        WORDS.inc(result)
+        moves.record('move', self.chat_id, user=user.id, word=word_lower, result=result,
+                     stage=self.increment_stage + 1,
+                     ms=round((time.monotonic() - self.turn_started) * 1000) if self.turn_started else None)
+        if result != "accepted":
+            return result
 
         # Update game state
-        self.used_words.add(word_lower)
-        self.current_word = word_lower
+        self.use_word(word_lower)
+        self.words_played += 1
         self.words_played_in_stage += 1
         self.current_player_index = (self.current_player_index + 1) % len(self.players)
 
+        self.say(
+            f"✅ Accepted\\! Next word must start with *{self.current_word[-1].upper()}*",
+            parse_mode="MarkdownV2"
+        )
+
         # Check stage progression
-        current_stage = self.INCREMENT_SEQUENCE[self.increment_stage]
+        current_stage = self.sequence[self.increment_stage]
         required_words, _, _ = current_stage
         if required_words is not None and self.words_played_in_stage >= required_words:
             self.increment_stage += 1
             self.words_played_in_stage = 0
-            await self.announce_new_stage()
+            moves.record('stage', self.chat_id, stage=self.increment_stage + 1)
+            self.announce_new_stage()
 
-        if self.timer_task and not self.timer_task.done():
-            self.timer_task.cancel()
+        if self.turn_timer:
+            self.turn_timer.cancel()
 
-        await self.next_turn()
-        return True
+        self.next_turn()
+        return result
 
     def get_round_params(self):
-        if self.increment_stage >= len(self.INCREMENT_SEQUENCE):
-            return self.INCREMENT_SEQUENCE[-1][1], self.INCREMENT_SEQUENCE[-1][2]
-        return self.INCREMENT_SEQUENCE[self.increment_stage][1], self.INCREMENT_SEQUENCE[self.increment_stage][2]
+        if self.increment_stage >= len(self.sequence):
+            return self.sequence[-1][1], self.sequence[-1][2]
+        return self.sequence[self.increment_stage][1], self.sequence[self.increment_stage][2]
 
-    async def handle_timeout(self, timeout, user_id):
-        await asyncio.sleep(timeout)
-        async with game_lock:
+    async def handle_timeout(self, user_id):
+        async with chat_lock(self.chat_id):
+            if active_games.get(self.chat_id) is not self:
+                return
             if self.state != 'playing' or self.current_player_index >= len(self.players):
                 return
             current_player = self.players[self.current_player_index]
             if current_player.id == user_id:
-                await self.eliminate_player(current_player)
-
-    async def handle_round_timeout(self, round_duration):
-        if round_duration is not None:
-            await asyncio.sleep(round_duration * 60)  # Convert minutes to seconds
-            async with game_lock:
-                if self.state == 'playing':
-                    await self.end_round()
-
-    async def end_round(self):
-        self.current_round += 1
-        if self.current_round > 5:
-            await self.end_game(self.players[0])  # End game if all rounds are completed
-        else:
-            await self.start_game()  # Start the next round
+                self.eliminate_player(current_player)
+        await settle_game(self)
 
-    async def eliminate_player(self, player):
+    def eliminate_player(self, player):
         self.players.remove(player)
+        ELIMINATIONS.inc(self.increment_stage + 1)
+        moves.record('eliminate', self.chat_id, user=player.id, stage=self.increment_stage + 1,
+                     remaining=len(self.players))
         escaped_name = escape_markdown(format_name(player), version=2)
-        await self.bot.send_message(
-            self.chat_id,
+        self.say(
             f"💥 *TIME'S UP\\!* 💥\n"
             f"😢 *{escaped_name}* has been eliminated\\!\n"
             f"🚫 Remaining players: *{len(self.players)}*",
             parse_mode="MarkdownV2"
         )
-        
+
         if len(self.players) > 1:
             self.current_player_index %= len(self.players)
-            await self.next_turn()
+            self.next_turn()
         else:
-            # Clean up when only 1 player remains
-            winner = self.players[0]
-            await self.end_game(winner)
-            
-            # Remove from active games
-            async with game_lock:
-                if self.chat_id in active_games:
-                    del active_games[self.chat_id]
-
-    async def end_game(self, winner):
+            # Only 1 player remains; the caller removes the ended game
+            self.end_game(self.players[0])
+
+    def end_game(self, winner):
         self.state = 'ended'
-        async with score_lock:
-            scores[str(winner.id)] = scores.get(str(winner.id), 0) + 10
-            with open('score.json', 'w') as f:
-                json.dump(scores, f)
-        
+        self.cancel_timers()
+        current_turns.pop(self.chat_id, None)
+        GAMES.inc("won")
+        total = score_store.add(winner.id, 10, chat_id=self.chat_id)
+        moves.record('win', self.chat_id, user=winner.id, moves=self.words_played,
+                     seconds=round(time.time() - (self.started_at or time.time())),
+                     stage=self.increment_stage + 1)
+
         escaped_name = escape_markdown(format_name(winner), version=2)
-        await self.bot.send_message(
-            self.chat_id,
+        self.say(
             f"🎉🎊 *VICTORY ROYALE\\!* 🎊🎉\n\n"
             f"👑 *{escaped_name}* is the ON9 MASTER\\!\n"
             f"➕ *\\+10 Trophies* 🏆\n\n"
-            "🏅 \\_New total\\:_ *{}*".format(scores.get(str(winner.id), 0) + 10),
+            "🏅 \\_New total\\:_ *{}*".format(total),
             parse_mode="MarkdownV2"
         )
 
-        async with game_lock:
-            del active_games[self.chat_id]
+class OnTurn(filters.MessageFilter):
+    """Passes only messages from the player on turn in a running game.
+
+    Group chatter is dropped by the dispatcher without taking a lock or
+    starting a handler, so chats without a game cost one dict lookup.
+    """
+
+    def filter(self, message):
+        user = message.from_user
+        return user is not None and current_turns.get(message.chat_id) == user.id
+
 def format_name(user):
     return escape_markdown(user.first_name, version=2)
 
-async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    chat_id = update.effective_chat.id
-    async with game_lock:
-        game = active_games.get(chat_id)
-        if not game or game.state != 'joining':
-            await update.message.reply_text("🚫 No active game to join.")
-            return
-        if user in game.players:
-            await update.message.reply_text("✅ You've already joined!")
-            return
-        game.players.append(user)
-        await update.message.reply_text(
-            f"🎉 *WELCOME {format_name(user)}!* 🎉\n"
-            "📊 Current players: *{}* 👥".format(len(game.players)),
-            parse_mode='MarkdownV2'
-        )
+def reply(update, context, text, **kwargs):
+    # Replies share the chat's outbound queue with the game's messages
+    outbound.send(context.bot, update.effective_chat.id, text, **kwargs)
 
 async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Create "Add to Group" button with bot's username
     bot_username = context.bot.username
     add_url = f"https://t.me/{bot_username}?startgroup=start"
-    
+
     keyboard = [[InlineKeyboardButton("➕ Add to Group", url=add_url)]]
     reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(
+
+    reply(
+        update, context,
         f"👋 *Hi there\!* \n\n"
         f"🎮 I host *Word Chain* games in Telegram groups\!\n"
         f"➕ *Add me to a group to start playing\!* 🚀",
@@ -270,119 +528,163 @@ async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_T
 
 async def startclassic(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    async with game_lock:
+    profiles.remember(update.effective_user)
+    language = context.args[0].lower() if context.args else config.DEFAULT_LANGUAGE
+    if not lexicons.has(language):
+        outbound.send(
+            context.bot, chat_id,
+            f"⚠️ No word list for '{language}'. Available: {', '.join(lexicons.available())}"
+        )
+        return
+    # Loaded outside the chat lock; the first game in a language may wait
+    # for the word list to be compiled
+    lexicon = await lexicons.get(language)
+
+    async with chat_lock(chat_id):
         if chat_id in active_games:
             # Game already exists - notify user
-            await update.message.reply_text(
+            outbound.send(
+                context.bot, chat_id,
                 "⚠️ A game is already in progress! Please wait for it to finish."
             )
             return
-            
+
         # Create new game if none exists
-        game = GameState(chat_id, context.bot)
-        active_games[chat_id] = game
-        game.join_task = asyncio.create_task(start_joining(chat_id, context.bot))
-        
+        game = GameState(chat_id, context.bot, language, lexicon)
+        GAMES.inc("created")
+        async with game_lock:
+            active_games[chat_id] = game
+        game.join_timer = timers.schedule(60, start_joining, chat_id, context.bot)
+
         # Send game start message
-        await update.message.reply_text(
+        game.say(
             "🎮 *A new Word Chain game has started\!*\n\n"
             "⏳ *Join now with* `/join` *within 30 seconds\!*",
             parse_mode="MarkdownV2"
         )
+        snapshots.mark(game)
 
 async def start_joining(chat_id, bot):
-    await asyncio.sleep(60)
-    async with game_lock:
+    async with chat_lock(chat_id):
         game = active_games.get(chat_id)
         if not game or game.state != 'joining':
             return
         if len(game.players) >= 2:
             game.state = 'playing'
-            await game.start_game()
+            GAMES.inc("started")
+            game.start_game()
         else:
-            await bot.send_message(
-                chat_id, 
+            game.state = 'ended'
+            GAMES.inc("cancelled")
+            game.say(
                 "❌ *Not enough players\!* \n"
                 "📢 *Game cancelled\.* Try again later\!"
                 , parse_mode="MarkdownV2"
             )
-            del active_games[chat_id]
+    await settle_game(game)
 
 async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     chat_id = update.effective_chat.id
-    async with game_lock:
+    async with chat_lock(chat_id):
         game = active_games.get(chat_id)
         if not game or game.state != 'joining':
-            await update.message.reply_text("🚫 No active game to join\\.")
-            return
-        if user in game.players:
-            await update.message.reply_text("✅ You've already joined\\!")
-            return
-        game.players.append(user)
-        await update.message.reply_text(
-            f"🎉 *WELCOME {format_name(user)}\\!* 🎉\n"
-            "📊 Current players: *{}* 👥".format(len(game.players)),
-            parse_mode="MarkdownV2"
-        )
+            text = "🚫 No active game to join\\."
+        elif user in game.players:
+            text = "✅ You've already joined\\!"
+        else:
+            game.players.append(user)
+            profiles.remember(user)
+            snapshots.mark(game)
+            text = (
+                f"🎉 *WELCOME {format_name(user)}\\!* 🎉\n"
+                "📊 Current players: *{}* 👥".format(len(game.players))
+            )
+        reply(update, context, text, parse_mode="MarkdownV2")
+
+def rejection_message(game, word, result):
+    min_length, _ = game.get_round_params()
+    letter = escape_markdown(game.current_word[-1].upper(), version=2)
+    if result == "not_your_turn":
+        return "⚠️ It\'s not your turn\\!"
+    if result == "too_short":
+        return f"❌ *Too short\\!* Words need at least `{min_length}` letters\\."
+    if result == "wrong_letter":
+        return f"❌ *Wrong letter\\!* Your word must start with `{letter}`\\."
+    if result == "used":
+        return "❌ *Already used\\!* Every word can be played once per game\\."
+    text = "❌ *Not in the word list\\!*"
+    suggestions = game.suggest(word)
+    if suggestions:
+        text += "\n💡 Did you mean: " + ", ".join(f"`{escape_markdown(w, version=2)}`" for w in suggestions) + "?"
+    return text
+
+def with_skipped(text, skipped):
+    if skipped:
+        text += f"\n🔇 _{skipped} more ignored or rejected in the last few seconds_"
+    return text
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
     word = update.message.text.strip().lower()
-    
-    async with game_lock:
+    profiles.remember(user)
+
+    # Checked before taking the lock, so dropped words never wait for it
+    game = active_games.get(chat_id)
+    if game and not flood.allow(chat_id, user.id, game.increment_stage):
+        # Only the player on turn gets here, so tell them the word was
+        # ignored, or count it in the next reply they get
+        skipped = flood.notice(chat_id, user.id, game.increment_stage, dropped=True)
+        if skipped is not None:
+            text = "🐢 *Too fast\\!* That word was ignored, send it again in a moment\\."
+            game.say(with_skipped(text, skipped), reply_to_message_id=update.message.message_id,
+                     parse_mode="MarkdownV2")
+        return
+
+    async with chat_lock(chat_id):
         game = active_games.get(chat_id)
         if not game or game.state != 'playing':
             return
 
         current_player = game.players[game.current_player_index]
         if user.id != current_player.id:
-            await update.message.reply_text(
-                "⚠️ It\'s not your turn\!", 
-                reply_to_message_id=update.message.message_id, 
-                parse_mode="MarkdownV2"
-            )
-            return
-
-        success = await game.process_word(user, word)
-        if success:
-            await update.message.reply_text(
-                f"✅ Accepted\! Next word must start with *{game.current_word[-1].upper()}*",
-                parse_mode="MarkdownV2"
-            )
-
+            WORDS.inc("not_your_turn")
+            result = "not_your_turn"
         else:
-            await update.message.reply_text(
-                "❌ *Invalid word\\!* \n\n"
-                "⚠️ Your word must meet these conditions:\n"
-                f"🔹 *At least* `{game.get_round_params()[0]}` *letters*\n"
-                f"🔹 *Must start with:* `{escape_markdown(game.current_word[-1], version=2)}`\n"
-                "🔹 *Must be valid \\& unused* ❌",
-                parse_mode="MarkdownV2"
-            )
+            result = game.process_word(user, word)
+        # Asked before the reply is built, so suggestions are only looked
+        # up for replies that will actually be sent
+        skipped = flood.notice(chat_id, user.id, game.increment_stage) if result != "accepted" else None
+        if skipped is not None:
+            text = rejection_message(game, word, result)
+            game.say(with_skipped(text, skipped), reply_to_message_id=update.message.message_id,
+                     parse_mode="MarkdownV2")
+
+    await settle_game(game)
 
 async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     user_id = str(user.id)
-    
-    async with score_lock:
-        sorted_scores = sorted(scores.items(), key=lambda x: -x[1])
-        score = scores.get(user_id, 0)
-        
-        try:
-            user_rank = [uid for uid, _ in sorted_scores].index(user_id) + 1
-        except ValueError:
-            user_rank = "Unranked"
+    profiles.remember(user)
+
+    score = score_store.get(user_id)
+    user_rank = score_store.ranks.rank(user_id) or "Unranked"
+    month = score_store.boards.board('month')
+    month_rank = month.rank(user_id) or "Unranked"
 
-    await update.message.reply_text(
+    reply(
+        update, context,
         "🌟 *{}'S TROPHY CASE* 🌟\n\n"
-        "🏆 × *{}* \\| 📊 Rank: \\#{}\n\n"
+        "🏆 × *{}* \\| 📊 Rank: \\#{}\n"
+        "📅 This month: *{}* \\| Rank: \\#{}\n\n"
         "✨ _Keep playing to unlock more achievements\\!_ ✨\n"
         "💡 _Top 3 players get special rewards at month end\\!_".format(
             escape_markdown(user.first_name or user.username, version=2),
-            score, 
-            user_rank
+            score,
+            user_rank,
+            month.get(user_id),
+            month_rank
         ),
         parse_mode="MarkdownV2"
     )
@@ -390,6 +692,7 @@ async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user = update.effective_user
+    profiles.remember(user)
 
     # Check permissions
     allowed = False
@@ -397,58 +700,89 @@ async def endgame(update: Update, context: ContextTypes.DEFAULT_TYPE):
         allowed = True
     else:
         try:
-            member = await context.bot.get_chat_member(chat_id, user.id)
+            member = await call_api("getChatMember", context.bot.get_chat_member(chat_id, user.id))
             if member.status == "creator":
                 allowed = True
         except:
             pass
 
     if not allowed:
-        await update.message.reply_text("🚫 Only the bot owner, sudo users, or group owner can end the game.")
+        reply(update, context, "🚫 Only the bot owner, sudo users, or group owner can end the game.")
         return
 
-    async with game_lock:
-        if chat_id in active_games:
-            del active_games[chat_id]
-            await update.message.reply_text("🛑 Game ended by authorized user.")
-        else:
-            await update.message.reply_text("⚠️ No active game.")
+    async with chat_lock(chat_id):
+        game = active_games.get(chat_id)
+        if game:
+            game.state = 'ended'
+            GAMES.inc("aborted")
+            moves.record('abort', chat_id, moves=game.words_played, stage=game.increment_stage + 1)
+            await discard_game(game)
+
+    if game:
+        reply(update, context, "🛑 Game ended by authorized user.")
+    else:
+        reply(update, context, "⚠️ No active game.")
 
+LEADERBOARD_WINDOWS = {
+    "today": "day", "day": "day", "week": "week", "month": "month", "all": "all",
+}
+LEADERBOARD_TITLES = {
+    "day": "TODAY'S", "week": "THIS WEEK'S", "month": "THIS MONTH'S", "all": "TOP",
+}
 
 async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    async with score_lock:
-        top = sorted(scores.items(), key=lambda x: -x[1])[:10]
+    # /leaderboard [today|week|month|all] [group]
+    args = [a.lower() for a in context.args or []]
+    profiles.remember(update.effective_user)
+    window = next((LEADERBOARD_WINDOWS[a] for a in args if a in LEADERBOARD_WINDOWS), "all")
+    chat_id = update.effective_chat.id if "group" in args else None
+    if window == "all" and chat_id is None:
+        top = score_store.ranks.top(10)
+    else:
+        top = score_store.boards.board(window, chat_id).top(10)
 
-    lb_header = "🏆✨ *TOP CHAMPIONS* ✨🏆\n\n"
-    
-    lb_body = ""
-    for i, (user_id, score) in enumerate(top, 1):
-        user = await context.bot.get_chat(int(user_id))
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"#{i}"
-        username = escape_markdown(f"{user.first_name or ''} @{user.username}" if user.username else user.first_name, version=2)
-        
-        lb_body += f"{medal} *{username}* — 🎖 *{score}*\n"
+    title = LEADERBOARD_TITLES[window] + (" GROUP" if chat_id is not None else "")
+    lb_header = f"🏆✨ *{escape_markdown(title, version=2)} CHAMPIONS* ✨🏆\n\n"
+
+    # Re-render only when the ranking itself has changed
+    key = (window, chat_id)
+    cached = leaderboard_cache.get(key)
+    if cached and cached[0] == top:
+        lb_body = cached[1]
+        leaderboard_cache.move_to_end(key)
+    else:
+        users = await profiles.resolve(context.bot, [int(user_id) for user_id, _ in top])
+        lb_body = ""
+        for i, (user_id, score) in enumerate(top, 1):
+            user = users[int(user_id)]
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"#{i}"
+            username = escape_markdown(f"{user.first_name or ''} @{user.username}" if user.username else user.first_name, version=2)
+
+            lb_body += f"{medal} *{username}* — 🎖 *{score}*\n"
+        leaderboard_cache[key] = (top, lb_body)
+        leaderboard_cache.move_to_end(key)
+        while len(leaderboard_cache) > LEADERBOARD_CACHE_SIZE:
+            leaderboard_cache.popitem(last=False)
 
     lb_footer = (
         "\n🔥 *Keep playing to climb the ranks\\!* \n"
         "🌟 *Top 3 players win exclusive rewards\\!*"
     )
 
-    await update.message.reply_text(
+    reply(
+        update, context,
         lb_header + lb_body + lb_footer,
         parse_mode="MarkdownV2"
     )
 
 
 async def reset_scores():
-    async with score_lock:
-        global scores
-        scores = {}
-        with open('score.json', 'w') as f:
-            json.dump(scores, f)
+    score_store.reset()
+    await score_store.flush()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    reply(
+        update, context,
         "👋 **Welcome to WordChainBot\\!** 🔠✨\n\n"
         "Let the word battle begin\\! 🔥 Type `/startclassic` in a group to get started\\!",
         parse_mode="MarkdownV2"
@@ -463,15 +797,15 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "➜ Survive the rounds to win trophies! 🏆\n\n"
         "📜 *Commands:*\n"
         "➤ `/start` - Start the bot\n"
-        "➤ `/startclassic` - Start a new Word Chain game\n"
+        "➤ `/startclassic [lang]` - Start a new Word Chain game\n"
         "➤ `/join` - Join the game\n"
         "➤ `/score` - Check your score\n"
-        "➤ `/leaderboard` - View top players\n"
+        "➤ `/leaderboard [today|week|month] [group]` - View top players\n"
         "➤ `/help` - Get help & instructions\n\n"
         "💡 *Need support?* Message @suu_111 for any issues!"
     )
     
-    await update.message.reply_text(help_text, parse_mode="MarkdownV2")
+    reply(update, context, help_text, parse_mode="MarkdownV2")
 
 async def rules(update: Update, context: CallbackContext):
     rules_text = (
@@ -480,59 +814,143 @@ async def rules(update: Update, context: CallbackContext):
         "- The word must start with the last letter of the previous word.\n"
         "- Words must meet the required length (increases as the game progresses).\n"
         "- No repeating words within the same game.\n"
+        "- If no unused word can continue the chain, the bot starts it again from a new word.\n"
         "- If you fail to submit in time, you're eliminated!\n"
         "🏆 The last player standing wins the round!\n"
     )
-    await update.message.reply_text(rules_text, parse_mode="Markdown")
-
-import json
-import os
+    reply(update, context, rules_text, parse_mode="Markdown")
 
 async def reset(update: Update, context: CallbackContext):
     user = update.effective_user
+    profiles.remember(user)
     chat_id = update.message.chat_id
 
     # Check if the user is an admin
-    chat_member = await context.bot.get_chat_member(chat_id, user.id)
+    chat_member = await call_api("getChatMember", context.bot.get_chat_member(chat_id, user.id))
     if chat_member.status not in ["administrator", "creator"]:
-        await update.message.reply_text("❌ Only admins can reset scores!")
+        reply(update, context, "❌ Only admins can reset scores!")
         return
 
-    # Reset scores by clearing the score file
-    score_file = "score.json"
-    if os.path.exists(score_file):
-        with open(score_file, "w") as f:
-            json.dump({}, f)  # Empty dictionary resets scores
+    await reset_scores()
 
-    await update.message.reply_text("✅ Scores have been reset!")
+    reply(update, context, "✅ Scores have been reset!")
 
 
-def main():
-    application = Application.builder().token("8321544129:AAHTrGkd8yOjr4IMN4ZKES9UzxRwwE7kyLk").build()
-    
+async def restore_games(bot):
+    for chat_id, data in snapshots.load().items():
+        try:
+            # Snapshots from before language packs are English games
+            data.setdefault('language', 'en')
+            lexicon = await lexicons.get(data['language'])
+            game = GameState.restore(chat_id, bot, data, lexicon)
+        except (KeyError, IndexError, TypeError, OSError):
+            logger.exception("Could not restore game in %s", chat_id)
+            snapshots.forget(chat_id)
+            continue
+        active_games[chat_id] = game
+        if game.turn_timer:
+            # The last turn message may be far up the chat by now
+            game.say("🔄 *Back online\\!* The game goes on\\.", parse_mode="MarkdownV2")
+            game.announce_turn(game.players[game.current_player_index],
+                               math.ceil(game.turn_timer.remaining()))
+    if active_games:
+        logger.info("Restored %d games", len(active_games))
+
+async def on_startup(application):
+    # Compile and map the default word list now rather than in the first game
+    await lexicons.get(config.DEFAULT_LANGUAGE)
+    await restore_games(application.bot)
+    snapshots.start()
+    moves.start()
+    score_store.start()
+    if config.METRICS_PORT:
+        # Workers of a sharded deployment listen on consecutive ports
+        port = config.METRICS_PORT + application.bot_data.get("shard", 0)
+        application.bot_data["metrics_runner"] = await metrics.serve(config.METRICS_LISTEN, port)
+        application.bot_data["loop_lag_task"] = asyncio.create_task(metrics.watch_loop_lag())
+
+async def on_stop(application):
+    # Runs once updates have stopped but before the bot's HTTP client is
+    # closed: freeze the games, then send whatever they still had queued
+    await timers.close()
+    # Snapshot every game while the turn timers still know how much time is left
+    for game in active_games.values():
+        snapshots.mark(game)
+    await outbound.close()
+
+async def on_shutdown(application):
+    if "metrics_runner" in application.bot_data:
+        application.bot_data.pop("loop_lag_task").cancel()
+        await application.bot_data.pop("metrics_runner").cleanup()
+    await snapshots.close()
+    await moves.close()
+    await score_store.close()
+
+LOG_FORMAT = "%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s"
+
+def build_application(builder):
+    application = (
+        builder
+        .token(config.BOT_TOKEN)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+
     # Add PRIVATE message handler first
-    application.add_handler(MessageHandler(filters.ChatType.PRIVATE, handle_private_message))
+    application.add_handler(MessageHandler(filters.ChatType.PRIVATE, timed(handle_private_message)))
     
     # Then add game command handlers
-    application.add_handler(CommandHandler("startclassic", startclassic))
-    application.add_handler(CommandHandler("join", join))
+    application.add_handler(CommandHandler("startclassic", timed(startclassic)))
+    application.add_handler(CommandHandler("join", timed(join)))
     
     # Add game message handler BEFORE general text handler
     application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS,
-        handle_message
+        OnTurn() & filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS,
+        timed(handle_message)
     ))
     
     # Other handlers
-    application.add_handler(CommandHandler("score", show_score))
-    application.add_handler(CommandHandler("endgame", endgame))
-    application.add_handler(CommandHandler("leaderboard", leaderboard))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("rules", rules))
-    application.add_handler(CommandHandler("reset", reset))
-
-    application.run_polling()
+    application.add_handler(CommandHandler("score", timed(show_score)))
+    application.add_handler(CommandHandler("endgame", timed(endgame)))
+    application.add_handler(CommandHandler("leaderboard", timed(leaderboard)))
+    application.add_handler(CommandHandler("help", timed(help_command)))
+    application.add_handler(CommandHandler("start", timed(start)))
+    application.add_handler(CommandHandler("rules", timed(rules)))
+    application.add_handler(CommandHandler("reset", timed(reset)))
+    return application
+
+def run_shard(index, count, queue, turns):
+    """Entry point of worker ``index`` of ``count`` in sharded mode."""
+    global current_turns
+    logging.basicConfig(format=LOG_FORMAT)
+    # The front drops chatter with a copy of this, kept up to date over ``turns``
+    current_turns = shards.ReportedTurns(turns)
+    snapshots.path = f"{config.SNAPSHOT_PATH}.{index}"
+    # Telegram's global send limit is shared by all workers
+    bucket = outbound.global_bucket
+    outbound.global_bucket = TokenBucket(bucket.rate / count, max(1, bucket.capacity / count))
+    application = build_application(Application.builder().updater(None))
+    application.bot_data["shard"] = index
+    shards.run_worker(application, queue)
+
+def main():
+    logging.basicConfig(format=LOG_FORMAT)
+    if not config.BOT_TOKEN:
+        raise SystemExit("Set the BOT_TOKEN environment variable to your bot token")
+
+    if config.WORKERS > 1:
+        asyncio.run(shards.run_front(run_shard, config.WORKERS))
+        return
+
+    application = build_application(Application.builder())
+    if config.BOT_MODE == "webhook":
+        # aiohttp is only needed in webhook mode
+        from webhook import run_webhook
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ChatLocks:
+    """Registry of per-chat locks.
+
+    A lock exists only while some coroutine holds or waits for it, so the
+    registry stays as small as the number of chats doing work right now.
+    Total time spent waiting for and holding locks is kept in
+    ``wait_seconds`` and ``hold_seconds`` over ``acquired`` acquisitions.
+    """
+
+    def __init__(self):
+        self._locks = {}  # chat_id -> [lock, holders + waiters]
+        self.acquired = 0
+        self.wait_seconds = 0.0
+        self.hold_seconds = 0.0
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def __call__(self, chat_id):
+        entry = self._locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            requested = time.perf_counter()
+            async with entry[0]:
+                acquired = time.perf_counter()
+                self.acquired += 1
+                self.wait_seconds += acquired - requested
+                try:
+                    yield
+                finally:
+                    self.hold_seconds += time.perf_counter() - acquired
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[chat_id]
+
+
+class TimedLock:
+    """``asyncio.Lock`` keeping the same wait/hold totals as ``ChatLocks``."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._acquired_at = 0.0
+        self.acquired = 0
+        self.wait_seconds = 0.0
+        self.hold_seconds = 0.0
+
+    def locked(self):
+        return self._lock.locked()
+
+    async def __aenter__(self):
+        requested = time.perf_counter()
+        await self._lock.acquire()
+        self._acquired_at = time.perf_counter()
+        self.acquired += 1
+        self.wait_seconds += self._acquired_at - requested
+
+    async def __aexit__(self, *exc):
+        self.hold_seconds += time.perf_counter() - self._acquired_at
+        self._lock.release()
+
+
+class OrderedTasks:
+    """Runs coroutines concurrently across chats, one at a time per chat.
+
+    Work for the same chat starts in the order it was submitted. At most
+    ``max_pending`` jobs are queued or running; ``submit`` waits up to
+    ``timeout`` seconds for room and returns False if none came.
+    """
+
+    def __init__(self, max_pending=1000):
+        self.pending = 0
+        self._capacity = asyncio.Semaphore(max_pending)
+        self._order = ChatLocks()
+        self._tasks = set()
+
+    async def submit(self, chat_id, func, *args, timeout=None):
+        try:
+            await asyncio.wait_for(self._capacity.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.pending += 1
+        task = asyncio.get_running_loop().create_task(self._run(chat_id, func, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, chat_id, func, args):
+        try:
+            async with self._order(chat_id):
+                await func(*args)
+        except Exception:
+            logger.exception("Update for %s failed", chat_id)
+        finally:
+            self.pending -= 1
+            self._capacity.release()
+
+    async def drain(self):
+        await asyncio.gather(*self._tasks, return_exceptions=True)
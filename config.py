@@ -0,0 +1,74 @@
+import os
+
+
+def _per_stage(name, default):
+    return [float(v) for v in os.environ.get(name, default).split(",")]
+
+
+# Everything deployment-specific comes from the environment
+
+BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
+
+# "polling" (default) or "webhook"
+BOT_MODE = os.environ.get("BOT_MODE", "polling").lower()
+
+# Above 1, a front process receives updates and routes every chat to one of
+# this many worker processes; updates waiting per worker are capped
+WORKERS = int(os.environ.get("WORKERS", "1"))
+SHARD_QUEUE_SIZE = int(os.environ.get("SHARD_QUEUE_SIZE", "1000"))
+
+# Public HTTPS URL Telegram should POST updates to. Leave empty to run the
+# server without registering it, e.g. to replay recorded updates locally.
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+
+# Updates accepted but not yet handled; beyond this the server stalls
+# Telegram's connections and finally answers 503 so it retries later
+WEBHOOK_MAX_PENDING = int(os.environ.get("WEBHOOK_MAX_PENDING", "1000"))
+WEBHOOK_BACKPRESSURE_TIMEOUT = float(os.environ.get("WEBHOOK_BACKPRESSURE_TIMEOUT", "5"))
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Word lists: English is words.txt, any other language <code>.txt in
+# LEXICON_DIR. Loaded lists beyond the budget are dropped, least recently
+# used first.
+DEFAULT_LANGUAGE = os.environ.get("DEFAULT_LANGUAGE", "en")
+LEXICON_DIR = os.environ.get("LEXICON_DIR", "lexicons")
+LEXICON_BUDGET_MB = int(os.environ.get("LEXICON_BUDGET_MB", "256"))
+
+# Compressed log of every move, rotated past MOVE_LOG_ROTATE_MB; an empty
+# MOVE_LOG_DIR turns it off
+MOVE_LOG_DIR = os.environ.get("MOVE_LOG_DIR", "moves")
+MOVE_LOG_ROTATE_MB = int(os.environ.get("MOVE_LOG_ROTATE_MB", "64"))
+
+# "classic" plays the fixed stage table; "adaptive" (needs NumPy) tunes
+# stage lengths and timeouts to each word list and picks starting words
+# that leave many moves open
+DIFFICULTY = os.environ.get("DIFFICULTY", "classic").lower()
+
+# Outbound messages per second and burst, per chat and for the whole bot.
+# Telegram allows about 20 messages a minute in a group and 30 a second
+# overall; sharded workers split the global limit between them.
+OUTBOUND_CHAT_RATE = float(os.environ.get("OUTBOUND_CHAT_RATE", str(20 / 60)))
+OUTBOUND_CHAT_BURST = float(os.environ.get("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", "25"))
+OUTBOUND_GLOBAL_BURST = float(os.environ.get("OUTBOUND_GLOBAL_BURST", "25"))
+
+# Flood control: words per second and burst allowed per player and per
+# chat, one comma-separated value per stage (the last repeats). Rejections
+# get at most one reply per player every FLOOD_NOTICE_WINDOW seconds.
+FLOOD_USER_RATE = _per_stage("FLOOD_USER_RATE", "0.5,0.5,0.75,1,1")
+FLOOD_USER_BURST = _per_stage("FLOOD_USER_BURST", "3")
+FLOOD_CHAT_RATE = _per_stage("FLOOD_CHAT_RATE", "2,2,2,3,3")
+FLOOD_CHAT_BURST = _per_stage("FLOOD_CHAT_BURST", "6")
+FLOOD_NOTICE_WINDOW = float(os.environ.get("FLOOD_NOTICE_WINDOW", "5"))
+
+# Prometheus metrics on http://METRICS_LISTEN:METRICS_PORT/metrics; 0 disables
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_LISTEN = os.environ.get("METRICS_LISTEN", "127.0.0.1")
+
+# Append-only log of running games, replayed on start-up. Sharded workers
+# each keep their own, suffixed with the worker number.
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "games.log")
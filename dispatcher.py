@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+from metrics import OUTBOUND_DELAY, call_api
+
+MAX_MESSAGE_LENGTH = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def time_to_full(self):
+        self._refill()
+        return (self.capacity - self.tokens) / self.rate
+
+    def try_take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def take(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Chat:
+    __slots__ = ('queue', 'bucket', 'wakeup', 'task')
+
+    def __init__(self, bucket):
+        self.queue = deque()
+        self.bucket = bucket
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+
+class Dispatcher:
+    """Outbound message queue, one worker per chat.
+
+    ``send`` only appends to the chat's queue, so game code can call it
+    while holding locks and messages keep the order they were queued in.
+    The worker waits ``window`` seconds after being woken, merges queued
+    messages with the same options into one, and sends them subject to a
+    per-chat and a global token bucket. A worker stays around until its
+    chat's bucket has refilled, then exits and forgets the chat; after
+    ``close`` it exits as soon as its queue is empty.
+
+    ``delivered`` counts messages that reached Telegram (before merging)
+    and ``delay_seconds`` the total time they spent queued.
+    """
+
+    def __init__(self, chat_rate=20 / 60, chat_burst=3, global_rate=25.0, global_burst=25, window=0.05):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.window = window
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._chats = {}
+        self._drain_waiters = []  # futures of drain() calls
+        self._closing = False
+        self.backlog = 0  # queued or being sent
+        self.delivered = 0
+        self.delay_seconds = 0.0
+
+    def __len__(self):
+        return self.backlog
+
+    def send(self, bot, chat_id, text, **kwargs):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(TokenBucket(self.chat_rate, self.chat_burst))
+            chat.task = asyncio.get_running_loop().create_task(self._run(chat_id, chat))
+        chat.queue.append((bot, text, kwargs, time.monotonic()))
+        self.backlog += 1
+        chat.wakeup.set()
+
+    async def _run(self, chat_id, chat):
+        while True:
+            if not chat.queue:
+                chat.wakeup.clear()
+                idle = chat.bucket.time_to_full()
+                if idle <= 0 or self._closing:
+                    break
+                try:
+                    await asyncio.wait_for(chat.wakeup.wait(), idle)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.sleep(self.window)
+            batch = list(chat.queue)
+            chat.queue.clear()
+            for bot, text, kwargs, queued in coalesce(batch):
+                await chat.bucket.take()
+                await self.global_bucket.take()
+                if await self._deliver(bot, chat_id, text, kwargs):
+                    now = time.monotonic()
+                    for stamp in queued:
+                        OUTBOUND_DELAY.observe(now - stamp)
+                        self.delay_seconds += now - stamp
+                    self.delivered += len(queued)
+            self.backlog -= len(batch)
+            if not self.backlog:
+                for waiter in self._drain_waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                self._drain_waiters.clear()
+        del self._chats[chat_id]
+
+    async def _deliver(self, bot, chat_id, text, kwargs, attempts=3):
+        for attempt in range(attempts):
+            try:
+                await call_api("sendMessage", bot.send_message(chat_id, text, **kwargs))
+                return True
+            except RetryAfter as e:
+                await asyncio.sleep(retry_delay(e))
+            except Exception:
+                logger.exception("Send to %s failed", chat_id)
+                return False
+        logger.warning("Dropped a message to %s after %d flood waits", chat_id, attempts)
+        return False
+
+    async def drain(self):
+        """Wait until every queued message has been sent or dropped."""
+        # A future per call rather than one Event, so the dispatcher isn't
+        # tied to whichever event loop first waited on it
+        if self.backlog:
+            waiter = asyncio.get_running_loop().create_future()
+            self._drain_waiters.append(waiter)
+            await waiter
+
+    async def close(self):
+        """Send everything queued, then stop every worker."""
+        self._closing = True
+        try:
+            for chat in list(self._chats.values()):
+                chat.wakeup.set()
+            await asyncio.gather(*(chat.task for chat in list(self._chats.values())))
+        finally:
+            self._closing = False
+
+
+def retry_delay(error):
+    """Seconds a ``RetryAfter`` asks to wait (a timedelta in newer releases)."""
+    delay = error.retry_after
+    return delay.total_seconds() if hasattr(delay, 'total_seconds') else delay
+
+
+def coalesce(batch):
+    """Merge consecutive messages that share a bot and send options.
+
+    Takes ``(bot, text, kwargs, queued_at)`` entries and returns them with
+    ``queued_at`` replaced by the list of times of the messages merged.
+    """
+    merged = []
+    for bot, text, kwargs, queued in batch:
+        if merged and 'reply_markup' not in kwargs:
+            last_bot, last_text, last_kwargs, stamps = merged[-1]
+            if (last_bot is bot and last_kwargs == kwargs
+                    and len(last_text) + len(text) + 2 <= MAX_MESSAGE_LENGTH):
+                merged[-1] = (bot, last_text + "\n\n" + text, kwargs, stamps + [queued])
+                continue
+        merged.append((bot, text, kwargs, [queued]))
+    return merged
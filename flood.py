@@ -0,0 +1,97 @@
+import time
+
+from dispatcher import TokenBucket
+
+
+class _Chat:
+    __slots__ = ('stage', 'bucket', 'users', 'notices')
+
+    def __init__(self, stage, bucket):
+        self.stage = stage
+        self.bucket = bucket
+        self.users = {}  # user_id -> TokenBucket
+        self.notices = {}  # user_id -> [time of last notice, notices skipped since, was for a drop]
+
+
+class FloodControl:
+    """Per-player and per-chat limits on words sent to a game.
+
+    ``allow`` takes a token from the sender's bucket and the chat's bucket
+    before a word reaches the game; without one the word is dropped and
+    counted in ``dropped``. Rates and bursts are given per stage, since
+    later stages have shorter turns: stage ``i`` uses the ``i``-th value of
+    each list, or the last one. ``notice`` decides whether a rejected or
+    dropped word gets a reply: at most one per player every
+    ``notice_window`` seconds, and it reports how many were skipped in
+    between. The first drop after a rejection is answered regardless, so
+    a player who typed a good word too soon after a few typos hears that
+    it was ignored.
+    """
+
+    def __init__(self, user_rate, user_burst, chat_rate, chat_burst, notice_window=5.0):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.notice_window = notice_window
+        self.enabled = True
+        self.dropped = {}  # (reason,) -> words dropped
+        self.suppressed = 0
+        self._chats = {}
+
+    def __len__(self):
+        return len(self._chats)
+
+    @staticmethod
+    def _at(values, stage):
+        return values[min(stage, len(values) - 1)]
+
+    def _chat(self, chat_id, stage):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            bucket = TokenBucket(self._at(self.chat_rate, stage), self._at(self.chat_burst, stage))
+            chat = self._chats[chat_id] = _Chat(stage, bucket)
+        elif chat.stage != stage:
+            chat.stage = stage
+            chat.bucket.rate = self._at(self.chat_rate, stage)
+            chat.bucket.capacity = self._at(self.chat_burst, stage)
+            for bucket in chat.users.values():
+                bucket.rate = self._at(self.user_rate, stage)
+                bucket.capacity = self._at(self.user_burst, stage)
+        return chat
+
+    def allow(self, chat_id, user_id, stage):
+        if not self.enabled:
+            return True
+        chat = self._chat(chat_id, stage)
+        bucket = chat.users.get(user_id)
+        if bucket is None:
+            bucket = chat.users[user_id] = TokenBucket(self._at(self.user_rate, stage), self._at(self.user_burst, stage))
+        if not bucket.try_take():
+            reason = ("user",)
+        elif not chat.bucket.try_take():
+            reason = ("chat",)
+        else:
+            return True
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+        return False
+
+    def notice(self, chat_id, user_id, stage, dropped=False):
+        """None if this rejection (or, with ``dropped``, this dropped word)
+        should go unanswered, otherwise how many earlier ones were skipped."""
+        if not self.enabled:
+            return 0
+        chat = self._chat(chat_id, stage)
+        now = time.monotonic()
+        entry = chat.notices.get(user_id)
+        if (entry is not None and now - entry[0] < self.notice_window
+                and (entry[2] or not dropped)):
+            entry[1] += 1
+            self.suppressed += 1
+            return None
+        skipped = entry[1] if entry else 0
+        chat.notices[user_id] = [now, 0, dropped]
+        return skipped
+
+    def forget(self, chat_id):
+        self._chats.pop(chat_id, None)
@@ -0,0 +1,174 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+import lexicon as lexicon_store
+
+MAGIC = b'WCFUZ001'
+HEADER = struct.Struct('<8sII')  # magic, words, keys
+
+# Roughly 8 bytes per key, to build and to map, and one key per letter of
+# every word; lists bigger than this go without suggestions rather than
+# blow the budget
+MAX_KEYS = 16_000_000
+
+
+class SuggestIndex:
+    """Spelling suggestions for a ``Lexicon`` by symmetric deletes.
+
+    Every word and each of its one-letter deletions is hashed with CRC-32,
+    and the index is a sorted array of ``hash << 32 | word number``. A typo
+    matches a word when the two share a variant, which covers one inserted,
+    missing, changed or swapped letter. Looking one up is a binary search
+    per variant of the typo, and each candidate is checked with a real edit
+    distance, so hash collisions never turn into suggestions.
+
+    Like the lexicon, the index is compiled to a file next to the word list
+    (see ``build``) and memory-mapped read-only.
+    """
+
+    def __init__(self, lexicon, data):
+        magic, words, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a compiled suggestion index")
+        if words != len(lexicon):
+            raise ValueError("suggestion index belongs to another word list")
+        self.lexicon = lexicon
+        self._data = data
+        end = HEADER.size + 8 * count
+        if sys.byteorder == 'little':
+            self._keys = memoryview(data)[HEADER.size:end].cast('Q')
+        else:
+            self._keys = array('Q', data[HEADER.size:end])
+            self._keys.byteswap()
+
+    @property
+    def nbytes(self):
+        return len(self._data)
+
+    @classmethod
+    def open(cls, lexicon, path):
+        with open(path, 'rb') as f:
+            return cls(lexicon, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _candidates(self, word):
+        keys = self._keys
+        found = set()
+        for variant in _variants(word):
+            h = zlib.crc32(variant.encode('utf-8'))
+            i = bisect_left(keys, h << 32)
+            while i < len(keys) and keys[i] >> 32 == h:
+                found.add(keys[i] & 0xFFFFFFFF)
+                i += 1
+        return found
+
+    def suggest(self, word, first=None, min_length=0, exclude=(), limit=3):
+        """Up to ``limit`` words within two edits of ``word``, closest first,
+        starting with ``first`` and at least ``min_length`` letters long."""
+        if len(word) > self.lexicon.max_length + 2:
+            # Too long to be two edits from any word; don't hash its variants
+            return []
+        scored = []
+        for i in self._candidates(word):
+            candidate = self.lexicon.word(i)
+            if candidate == word or len(candidate) < min_length or candidate in exclude:
+                continue
+            if first is not None and candidate[0] != first:
+                continue
+            d = distance(word, candidate, 2)
+            if d <= 2:
+                scored.append((d, abs(len(candidate) - len(word)), candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:limit]]
+
+
+def _variants(word):
+    yield word
+    for j in range(len(word)):
+        yield word[:j] + word[j + 1:]
+
+
+def distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it is
+    certain to exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _keys(lexicon):
+    for i, word in enumerate(lexicon):
+        for variant in set(_variants(word)):
+            yield zlib.crc32(variant.encode('utf-8')) << 32 | i
+
+
+def sorted_keys(lexicon):
+    """The index keys of ``lexicon`` as a sorted, little-endian array.
+
+    The keys go straight into one preallocated array, so building costs
+    the same 8 bytes per key as the index: a first pass counts them per top
+    byte of the hash, a second drops each into its bucket, and the buckets
+    are then sorted one at a time.
+    """
+    starts = [0] * 257
+    for key in _keys(lexicon):
+        starts[(key >> 56) + 1] += 1
+    for b in range(256):
+        starts[b + 1] += starts[b]
+    values = array('Q', [0]) * starts[-1]
+    fill = starts[:-1]
+    for key in _keys(lexicon):
+        b = key >> 56
+        values[fill[b]] = key
+        fill[b] += 1
+    for b in range(256):
+        lo, hi = starts[b], starts[b + 1]
+        values[lo:hi] = array('Q', sorted(values[lo:hi]))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def pack(lexicon):
+    """Compile the suggestion index of ``lexicon``."""
+    values = sorted_keys(lexicon)
+    return HEADER.pack(MAGIC, len(lexicon), len(values)) + values.tobytes()
+
+
+def _write(lexicon, f):
+    # Written from the array, without a second copy of it as bytes
+    values = sorted_keys(lexicon)
+    f.write(HEADER.pack(MAGIC, len(lexicon), len(values)))
+    values.tofile(f)
+
+
+def build(lexicon, target):
+    lexicon_store.write_file(target, lambda f: _write(lexicon, f))
+
+
+def load(lexicon, compiled, target=None):
+    """Open the index of ``lexicon`` (mapped from ``compiled``), rebuilding
+    it when stale. Returns None for lists over ``MAX_KEYS``."""
+    target = target or os.path.splitext(compiled)[0] + '.fuzzy'
+
+    def write(f):
+        if sum(len(w) + 1 for w in lexicon) > MAX_KEYS:
+            return False
+        _write(lexicon, f)
+
+    return lexicon_store.cached(compiled, target, write, lambda path: SuggestIndex.open(lexicon, path))
@@ -0,0 +1,379 @@
+import asyncio
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+import fuzzy
+
+MAGIC = b'WCLEX001'
+HEADER = struct.Struct('<8sIIII')  # magic, words, first buckets, last buckets, max length
+
+
+class Lexicon:
+    """Word list bucketed by first letter, last letter and length.
+
+    Words are kept sorted by (first letter, length, word) so every
+    first-letter bucket is one contiguous slice, ordered by length. A second
+    index array holds the same words ordered by (last letter, length). Each
+    bucket keeps a small table of where every length starts, so counting or
+    picking a random word with a minimum length never scans the word list.
+
+    The whole index lives in one packed little-endian buffer (see ``build``)
+    which is normally a read-only ``mmap`` of a compiled ``.bin`` file, so
+    opening it is instant and its pages are shared between processes.
+
+    Layout::
+
+        header        magic, word count, bucket counts, max length
+        first table   per first letter: letter, end, starts[0..max_length+1]
+        last table    same, indexing into the by-last array
+        offsets       uint32[words + 1] into the string blob
+        by-last       uint32[words], word indexes ordered by (last, length)
+        blob          UTF-8 words back to back
+    """
+
+    def __init__(self, data):
+        self._data = data
+        magic, self._n, n_first, n_last, self.max_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a compiled word list")
+        row = self.max_length + 4
+        pos = HEADER.size
+        self._first, pos = self._read_buckets(pos, n_first, row)
+        self._last, pos = self._read_buckets(pos, n_last, row)
+        self._offsets, pos = self._read_array(pos, self._n + 1)
+        self._by_last, pos = self._read_array(pos, self._n)
+        self._blob = pos
+        self.suggestions = None  # fuzzy.SuggestIndex, attached by LexiconPacks
+        self.stats = None  # lexstats.LexiconStats, in adaptive mode
+
+    @property
+    def nbytes(self):
+        return len(self._data)
+
+    @property
+    def by_last(self):
+        return self._by_last
+
+    def buckets(self, last=False):
+        """``{letter: (start, end, starts)}`` of the first-letter index, or
+        of the last-letter one (positions in ``by_last``)."""
+        return self._last if last else self._first
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_words(cls, words):
+        return cls(pack(words))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_words(read_words(path))
+
+    def _read_array(self, pos, count):
+        end = pos + 4 * count
+        if sys.byteorder == 'little':
+            return memoryview(self._data)[pos:end].cast('I'), end
+        values = array('I', self._data[pos:end])
+        values.byteswap()
+        return values, end
+
+    def _read_buckets(self, pos, count, row):
+        # letter -> (start, end, starts) where starts[n] is the position of
+        # the first word in the bucket with at least n letters
+        table, pos = self._read_array(pos, count * row)
+        buckets = {}
+        for b in range(count):
+            r = table[b * row:(b + 1) * row]
+            buckets[chr(r[0])] = (r[2], r[1], tuple(r[2:]))
+        return buckets, pos
+
+    def word(self, i):
+        start = self._blob + self._offsets[i]
+        return self._data[start:self._blob + self._offsets[i + 1]].decode('utf-8')
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return (self.word(i) for i in range(self._n))
+
+    def __contains__(self, word):
+        if not word:
+            return False
+        bucket = self._first.get(word[0])
+        if bucket is None or len(word) > self.max_length:
+            return False
+        key = word.encode('utf-8')
+        blob, offsets, data = self._blob, self._offsets, self._data
+        lo, end = bucket[2][len(word)], bucket[2][len(word) + 1]
+        hi = end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[blob + offsets[mid]:blob + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < end and data[blob + offsets[lo]:blob + offsets[lo + 1]] == key
+
+    def _range(self, buckets, letter, min_length):
+        bucket = buckets.get(letter)
+        if bucket is None:
+            return 0, 0
+        start, end, starts = bucket
+        return starts[min(max(min_length, 0), self.max_length + 1)], end
+
+    def count(self, first=None, min_length=0, last=None):
+        """Number of words with the given first or last letter and at least
+        ``min_length`` letters."""
+        if first is not None:
+            lo, hi = self._range(self._first, first, min_length)
+            return hi - lo
+        if last is not None:
+            lo, hi = self._range(self._last, last, min_length)
+            return hi - lo
+        return sum(self.count(first=k, min_length=min_length) for k in self._first)
+
+    def random_word(self, min_length=0, first=None, last=None):
+        """Uniformly random word matching the constraints, or ``None``."""
+        if first is not None:
+            lo, hi = self._range(self._first, first, min_length)
+            return self.word(random.randrange(lo, hi)) if hi > lo else None
+        if last is not None:
+            lo, hi = self._range(self._last, last, min_length)
+            return self.word(self._by_last[random.randrange(lo, hi)]) if hi > lo else None
+        # Pick a first letter weighted by its bucket size, then a word in it
+        total = self.count(min_length=min_length)
+        if not total:
+            return None
+        r = random.randrange(total)
+        for letter in self._first:
+            lo, hi = self._range(self._first, letter, min_length)
+            if r < hi - lo:
+                return self.word(lo + r)
+            r -= hi - lo
+
+
+class PlayableWords:
+    """Unused words left in one game, per first letter and length bucket.
+
+    ``bounds`` are the minimum lengths the game can ask for; bucket ``i``
+    holds words from ``bounds[i]`` letters up to the next bound. A letter's
+    counts are taken from the lexicon's bucket tables the first time it
+    comes up and decremented by ``use``, so asking how many moves are left
+    never scans the word list.
+    """
+
+    def __init__(self, lexicon, bounds):
+        self.lexicon = lexicon
+        self.bounds = tuple(sorted(set(bounds)))
+        self._left = {}  # letter -> unused words per bucket
+
+    def _row(self, letter):
+        row = self._left.get(letter)
+        if row is None:
+            totals = [self.lexicon.count(first=letter, min_length=b) for b in self.bounds] + [0]
+            row = self._left[letter] = [totals[i] - totals[i + 1] for i in range(len(self.bounds))]
+        return row
+
+    def use(self, word):
+        i = bisect_right(self.bounds, len(word)) - 1
+        if i >= 0:
+            self._row(word[0])[i] -= 1
+
+    def left(self, letter, min_length):
+        """Unused words starting with ``letter``; ``min_length`` should be
+        one of ``bounds``."""
+        return sum(self._row(letter)[bisect_left(self.bounds, min_length):])
+
+
+def read_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {w for w in (line.strip().lower() for line in f) if w}
+
+
+def _bucket_rows(words, order, key, max_length):
+    rows = {}
+    for pos, i in enumerate(order):
+        word = words[i]
+        letter = ord(key(word))
+        if letter not in rows:
+            rows[letter] = [letter, pos, pos] + [0] * (max_length + 1)
+        row = rows[letter]
+        row[1] = pos + 1
+        row[len(word) + 3] += 1
+    for row in rows.values():
+        for n in range(3, len(row)):
+            row[n] += row[n - 1]
+    return [v for row in rows.values() for v in row]
+
+
+def pack(words):
+    """Compile an iterable of words into the packed ``Lexicon`` format."""
+    words = sorted(set(words), key=lambda w: (w[0], len(w), w.encode('utf-8')))
+    max_length = max((len(w) for w in words), default=0)
+    by_last = sorted(range(len(words)), key=lambda i: (words[i][-1], len(words[i])))
+    first = _bucket_rows(words, range(len(words)), lambda w: w[0], max_length)
+    last = _bucket_rows(words, by_last, lambda w: w[-1], max_length)
+    encoded = [w.encode('utf-8') for w in words]
+    offsets = [0]
+    for w in encoded:
+        offsets.append(offsets[-1] + len(w))
+
+    row = max_length + 4
+    parts = [HEADER.pack(MAGIC, len(words), len(first) // row, len(last) // row, max_length)]
+    for values in (first, last, offsets, by_last):
+        values = array('I', values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        parts.append(values.tobytes())
+    parts.extend(encoded)
+    return b''.join(parts)
+
+
+def write_file(target, write):
+    """Write ``target`` with ``write(f)``, through a temporary file so that
+    readers never see it half written. Returns what ``write`` returns; if
+    that is False, ``target`` is left as it was."""
+    # Unique per process, as several workers may compile the same list
+    tmp = f'{target}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            result = write(f)
+        if result is not False:
+            os.replace(tmp, target)
+        return result
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def cached(source, target, write, read, errors=(ValueError,)):
+    """Open the file ``target`` derived from ``source`` with ``read``.
+
+    When ``target`` is missing, older than ``source`` or ``read`` fails
+    with one of ``errors``, it is first rewritten by ``write(f)``. A
+    ``write`` that returns False skips the rebuild and None is returned.
+    """
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(source):
+            return read(target)
+    except (OSError, *errors):
+        pass  # missing, stale or unreadable: rebuild it
+    if write_file(target, write) is False:
+        return None
+    return read(target)
+
+
+def _compiler(source):
+    return lambda f: f.write(pack(read_words(source)))
+
+
+def build(source, target):
+    """Compile the text word list at ``source`` into ``target``."""
+    write_file(target, _compiler(source))
+
+
+def load(source, compiled=None):
+    """Open the compiled form of ``source``, rebuilding it when stale."""
+    compiled = compiled or os.path.splitext(source)[0] + '.bin'
+    return cached(source, compiled, _compiler(source), Lexicon.open)
+
+
+
+class LexiconPacks:
+    """Word lists per language, loaded on first use.
+
+    Pack ``xx`` is compiled from ``<directory>/xx.txt`` unless ``sources``
+    names another file, together with its spelling suggestion index and,
+    with ``stats``, its letter statistics. ``get`` loads a pack in a worker thread, and callers
+    asking for a pack that is still loading wait for that same load. Loaded
+    packs are kept in LRU order; once together they exceed ``budget`` bytes
+    the least recently used are dropped. Games still playing in a dropped
+    language keep their reference, so it stays mapped until they end.
+    """
+
+    def __init__(self, directory, budget, sources=None, stats=False):
+        self.directory = directory
+        self.budget = budget
+        self.sources = dict(sources or {})
+        self.stats = stats
+        self.loads = 0
+        self._packs = OrderedDict()  # language -> Lexicon
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._packs)
+
+    @property
+    def nbytes(self):
+        return sum(self._size(pack) for pack in self._packs.values())
+
+    def sizes(self):
+        return {(language,): self._size(pack) for language, pack in self._packs.items()}
+
+    @staticmethod
+    def _size(pack):
+        extras = (pack.suggestions, pack.stats)
+        return pack.nbytes + sum(extra.nbytes for extra in extras if extra is not None)
+
+    def source(self, language):
+        return self.sources.get(language) or os.path.join(self.directory, language + '.txt')
+
+    def has(self, language):
+        return bool(re.fullmatch(r'[a-z]{2,8}', language)) and os.path.exists(self.source(language))
+
+    def available(self):
+        languages = set(self.sources)
+        if os.path.isdir(self.directory):
+            languages.update(name[:-4] for name in os.listdir(self.directory) if name.endswith('.txt'))
+        return sorted(language for language in languages if self.has(language))
+
+    async def get(self, language):
+        pack = self._packs.get(language)
+        if pack is not None:
+            self._packs.move_to_end(language)
+            return pack
+        task = self._inflight.get(language)
+        if task is None:
+            task = asyncio.ensure_future(self._load(language))
+            task.add_done_callback(lambda _: self._inflight.pop(language, None))
+            self._inflight[language] = task
+        return await asyncio.shield(task)
+
+    def _open(self, language):
+        source = self.source(language)
+        pack = load(source)
+        pack.suggestions = fuzzy.load(pack, os.path.splitext(source)[0] + '.bin')
+        if self.stats:
+            # NumPy is only needed for adaptive difficulty
+            import lexstats
+            pack.stats = lexstats.load(pack, os.path.splitext(source)[0] + '.bin')
+        return pack
+
+    async def _load(self, language):
+        pack = await asyncio.to_thread(self._open, language)
+        self.loads += 1
+        self._packs[language] = pack
+        while len(self._packs) > 1 and self.nbytes > self.budget:
+            self._packs.popitem(last=False)
+        return pack
+
+
+if __name__ == '__main__':
+    # python lexicon.py words.txt [words.bin]
+    src = sys.argv[1] if len(sys.argv) > 1 else 'words.txt'
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + '.bin'
+    build(src, dst)
+    lexicon = Lexicon.open(dst)
+    print(f"{len(lexicon)} words -> {dst}")
+    fuzzy.build(lexicon, os.path.splitext(dst)[0] + '.fuzzy')
@@ -0,0 +1,154 @@
+"""Letter-transition and length statistics of a word list.
+
+Needs NumPy, which is only imported by the adaptive difficulty mode
+(``DIFFICULTY=adaptive``).
+"""
+import os
+import random
+
+import numpy as np
+
+import lexicon as lexicon_store
+
+# Moves each stage keeps open in adaptive mode: stage ``i`` allows the
+# longest words for which the letter a player has to continue from still
+# starts at least STAGE_OPTIONS[i] of them, in all but the rarest
+# TURN_QUANTILE of turns.
+STAGE_OPTIONS = (150, 80, 40, 20, 10)
+TURN_QUANTILE = 0.1
+
+
+class LexiconStats:
+    """Counts of words by first letter, last letter and length.
+
+    ``counts[f, l, n]`` is the number of words of ``n`` letters starting
+    with ``alphabet[f]`` and ending with ``alphabet[l]``. It is built from
+    the lexicon's bucket tables with a handful of array operations, so it
+    never decodes a word, and cached next to the compiled list.
+
+    ``continuations[f, n]`` is how many words start with letter ``f`` and
+    have at least ``n`` letters: the moves open to a player who has to
+    continue from ``f``.
+    """
+
+    def __init__(self, alphabet, counts):
+        self.alphabet = alphabet
+        self.index = {letter: i for i, letter in enumerate(alphabet)}
+        self.counts = counts
+        by_first = counts.sum(axis=1, dtype=np.int64)
+        self.continuations = by_first[:, ::-1].cumsum(axis=1)[:, ::-1]
+        self.lengths = counts.sum(axis=(0, 1), dtype=np.int64)
+        self._stages = {}
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.continuations.nbytes
+
+    @classmethod
+    def compute(cls, lexicon):
+        first_buckets = lexicon.buckets()
+        last_buckets = lexicon.buckets(last=True)
+        alphabet = ''.join(sorted(set(first_buckets) | set(last_buckets)))
+        index = {letter: i for i, letter in enumerate(alphabet)}
+        size, width = len(alphabet), lexicon.max_length + 1
+
+        first = np.zeros(len(lexicon), np.int64)
+        last = np.zeros(len(lexicon), np.int64)
+        length = np.zeros(len(lexicon), np.int64)
+        for letter, (start, end, starts) in first_buckets.items():
+            first[start:end] = index[letter]
+            # Words are ordered by length within a bucket, and starts[n]
+            # is where those of at least n letters begin
+            length[start:end] = np.repeat(np.arange(width), np.diff(starts))
+        by_last = np.asarray(lexicon.by_last, dtype=np.int64)
+        for letter, (start, end, _) in last_buckets.items():
+            last[by_last[start:end]] = index[letter]
+
+        flat = (first * size + last) * width + length
+        counts = np.bincount(flat, minlength=size * size * width).astype(np.uint32)
+        return cls(alphabet, counts.reshape(size, size, width))
+
+    def save(self, path):
+        lexicon_store.write_file(path, self._write)
+
+    def _write(self, f):
+        np.savez(f, alphabet=np.array(self.alphabet), counts=self.counts)
+
+    @classmethod
+    def open(cls, path):
+        with np.load(path) as data:
+            return cls(str(data['alphabet']), data['counts'])
+
+    def options(self, letter, min_length):
+        """Words starting with ``letter`` of at least ``min_length`` letters."""
+        i = self.index.get(letter)
+        if i is None or min_length >= self.continuations.shape[1]:
+            return 0
+        return int(self.continuations[i, max(min_length, 0)])
+
+    def chain_options(self, min_length, quantile=TURN_QUANTILE):
+        """Continuations open in all but the ``quantile`` of turns with the
+        fewest, when words have at least ``min_length`` letters. Turns are
+        weighted by how often each letter ends such a word, since that is
+        the letter the next player has to continue from."""
+        min_length = min(max(min_length, 0), self.counts.shape[2] - 1)
+        ends = self.counts[:, :, min_length:].sum(axis=(0, 2), dtype=np.int64)
+        if not ends.any():
+            return 0
+        options = self.continuations[:, min_length]
+        order = np.argsort(options, kind='stable')
+        turns = np.cumsum(ends[order]) / ends.sum()
+        return int(options[order][np.searchsorted(turns, quantile)])
+
+    def branching(self, min_length):
+        """Per letter ``f``: the moves left two turns later, summed over
+        every word that can follow ``f``."""
+        min_length = min(max(min_length, 0), self.counts.shape[2] - 1)
+        transitions = self.counts[:, :, min_length:].sum(axis=2, dtype=np.int64)
+        return transitions @ self.continuations[:, min_length]
+
+    def start_letter(self, min_length, rng=random):
+        """Pick the last letter for a starting word: one whose continuations
+        branch out well, weighted by how well."""
+        branching = self.branching(min_length)
+        cutoff = np.median(branching[branching > 0]) if branching.any() else 0
+        letters = [(self.alphabet[i], int(b)) for i, b in enumerate(branching) if b and b >= cutoff]
+        if not letters:
+            return None
+        return rng.choices([l for l, _ in letters], weights=[b for _, b in letters])[0]
+
+    def stages(self, base, seconds_per_letter=1.0):
+        """``base`` (an ``INCREMENT_SEQUENCE``) with each stage's minimum
+        length raised as far as its ``STAGE_OPTIONS`` allow (see
+        ``chain_options``), never below the base, the shortest word in the
+        list or the stage before. Every letter added on top of what the
+        base table effectively asks adds a second to the timeout, at most
+        doubling it."""
+        key = tuple(base)
+        if key in self._stages:
+            return self._stages[key]
+        width = self.counts.shape[2]
+        shortest = int(np.flatnonzero(self.lengths)[0]) if self.lengths.any() else 0
+        tuned = []
+        previous = 0
+        for i, (words, min_length, timeout) in enumerate(base):
+            target = STAGE_OPTIONS[min(i, len(STAGE_OPTIONS) - 1)]
+            floor = max(min_length, shortest)
+            length = max(floor, previous)
+            while length + 1 < width and self.chain_options(length + 1) >= target:
+                length += 1
+            extra = round(seconds_per_letter * (length - floor))
+            tuned.append((words, length, min(timeout + extra, 2 * timeout)))
+            previous = length
+        self._stages[key] = tuned
+        return tuned
+
+
+def load(lexicon, compiled, target=None):
+    """Statistics of ``lexicon`` (mapped from ``compiled``), recomputed and
+    cached when stale."""
+    target = target or os.path.splitext(compiled)[0] + '.stats.npz'
+    return lexicon_store.cached(
+        compiled, target, lambda f: LexiconStats.compute(lexicon)._write(f), LexiconStats.open,
+        errors=(ValueError, KeyError),
+    )
@@ -0,0 +1,178 @@
+"""Minimal Prometheus instrumentation.
+
+Instruments live in a module-level registry and are plain dict updates, so
+they are cheap enough to leave on for every update. Values that already
+exist elsewhere (lock totals, queue sizes, active games) are registered
+with ``fn=`` and only read when ``/metrics`` is scraped.
+"""
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+
+from telegram.error import BadRequest, ChatMigrated, Conflict, EndPointNotFound, Forbidden, InvalidToken, RetryAfter
+
+_registry = []
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+        self._values = {}
+        _registry.append(self)
+
+    def _samples(self):
+        if self.fn is None:
+            return self._values.items()
+        value = self.fn()
+        return value.items() if isinstance(value, dict) else [((), value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HANDLER_LATENCY = Histogram("wordchain_handler_seconds", "Time spent in update handlers", ["handler"])
+HANDLER_ERRORS = Counter("wordchain_handler_errors_total", "Handlers that raised", ["handler"])
+API_LATENCY = Histogram("wordchain_api_call_seconds", "Latency of outbound Bot API calls", ["method"])
+API_ERRORS = Counter("wordchain_api_errors_total", "Failed Bot API calls by error and HTTP status",
+                     ["method", "error", "code"])
+OUTBOUND_DELAY = Histogram("wordchain_outbound_delay_seconds", "Time messages waited in the outbound queue")
+LOOP_LAG = Histogram("wordchain_event_loop_lag_seconds", "How late a periodic wake-up ran")
+
+
+def timed(handler):
+    """Wrap an update handler to record its latency and failures."""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+# python-telegram-bot raises one class per status and keeps no code
+ERROR_CODES = (
+    (RetryAfter, 429),
+    (InvalidToken, 401),
+    (Forbidden, 403),
+    (EndPointNotFound, 404),
+    (Conflict, 409),
+    (BadRequest, 400),
+    (ChatMigrated, 400),
+)
+
+
+def error_code(error):
+    """HTTP status behind a Bot API error, "" for network and other failures."""
+    for cls, code in ERROR_CODES:
+        if isinstance(error, cls):
+            return code
+    return ""
+
+
+async def call_api(method, coro):
+    """Await a Bot API call, recording its latency, error class and status."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    except Exception as e:
+        API_ERRORS.inc(method, type(e).__name__, error_code(e))
+        raise
+    finally:
+        API_LATENCY.observe(time.perf_counter() - start, method)
+
+
+async def watch_loop_lag(interval=0.5):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+async def serve(host, port):
+    """Expose ``/metrics`` over HTTP; returns the aiohttp runner."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=render().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,221 @@
+"""Compressed log of game events, and a CLI to summarise it.
+
+Every line is one JSON event: ``start`` (first word of a round), ``move``
+(a word from the player on turn, with its result and response time),
+``stage``, ``dead_end``, ``eliminate``, ``win`` and ``abort``. Files are
+gzip, rotated by size:
+
+    python movelog.py moves/ --top 20
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MoveLog:
+    """Buffered writer for game events.
+
+    ``record`` only appends to a list, so game code calls it under the chat
+    lock at no cost. Every ``interval`` seconds the buffer is encoded and
+    appended to the current file from a worker thread, as its own gzip
+    member, so a crash leaves every earlier batch readable. Files hold the
+    writing process's id and start a fresh one past ``rotate_bytes``. An
+    empty ``directory`` turns the log off.
+    """
+
+    def __init__(self, directory, interval=1.0, rotate_bytes=64 << 20):
+        self.directory = directory
+        self.interval = interval
+        self.rotate_bytes = rotate_bytes
+        self.written = 0
+        self._buffer = []
+        self._path = None
+        self._size = 0
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def record(self, event, chat_id, **fields):
+        if self.directory:
+            fields['t'] = round(time.time(), 3)
+            fields['e'] = event
+            fields['chat'] = chat_id
+            self._buffer.append(fields)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write, batch)
+            self.written += len(batch)
+
+    def _write(self, batch):
+        if self._path is None or self._size >= self.rotate_bytes:
+            os.makedirs(self.directory, exist_ok=True)
+            name = time.strftime('moves-%Y%m%d-%H%M%S') + f'-{os.getpid()}.jsonl.gz'
+            self._path = os.path.join(self.directory, name)
+            self._size = 0
+        data = ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in batch)
+        data = gzip.compress(data.encode('utf-8'))
+        with open(self._path, 'ab') as f:
+            f.write(data)
+        self._size += len(data)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Move log flush failed")
+
+    def start(self):
+        if self.directory and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+def read_events(paths):
+    """Yield events from log files and directories, oldest file first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.jsonl.gz'))
+        else:
+            files.append(path)
+    for path in sorted(files, key=os.path.getmtime):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except (EOFError, gzip.BadGzipFile) as e:
+            # The last batch of a file still being written, or after a crash
+            print(f"{path}: stopped early ({e})", file=sys.stderr)
+
+
+class HeavyHitters:
+    """Approximate top-K counts in fixed memory (Misra-Gries).
+
+    Keeps at most ``capacity`` counters; any word played more than
+    ``total / capacity`` times is guaranteed to be among them, and each
+    count is low by at most that much.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key):
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            for k in list(self.counts):
+                self.counts[k] -= 1
+                if not self.counts[k]:
+                    del self.counts[k]
+
+    def top(self, k):
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:k]
+
+
+class Summary:
+    """Running totals over a stream of events; memory does not grow with it."""
+
+    LENGTH_BINS = (5, 10, 20, 40, 80, 160)
+
+    def __init__(self, capacity=10000):
+        self.events = 0
+        self.words = HeavyHitters(capacity)
+        self.results = {}
+        self.response = {}  # stage -> [total ms, moves]
+        self.turns = {}  # stage -> turns that ended in a word or an elimination
+        self.eliminations = {}
+        self.games = 0
+        self.aborted = 0
+        self.moves_hist = [0] * (len(self.LENGTH_BINS) + 1)
+        self.seconds_total = 0.0
+
+    def add(self, event):
+        self.events += 1
+        kind = event.get('e')
+        stage = event.get('stage')
+        if kind == 'move':
+            self.results[event['result']] = self.results.get(event['result'], 0) + 1
+            entry = self.response.setdefault(stage, [0.0, 0])
+            entry[0] += event['ms']
+            entry[1] += 1
+            if event['result'] == 'accepted':
+                self.words.add(event['word'])
+                self.turns[stage] = self.turns.get(stage, 0) + 1
+        elif kind == 'eliminate':
+            self.eliminations[stage] = self.eliminations.get(stage, 0) + 1
+            self.turns[stage] = self.turns.get(stage, 0) + 1
+        elif kind == 'win':
+            self.games += 1
+            moves = event['moves']
+            self.moves_hist[sum(moves > b for b in self.LENGTH_BINS)] += 1
+            self.seconds_total += event['seconds']
+        elif kind == 'abort':
+            self.aborted += 1
+
+    def report(self, top=10, out=sys.stdout):
+        print(f"events           {self.events}", file=out)
+        print(f"games            {self.games} finished, {self.aborted} aborted", file=out)
+        if self.games:
+            print(f"average game     {self.seconds_total / self.games:.0f}s", file=out)
+        print("moves            " + ", ".join(f"{k} {v}" for k, v in sorted(self.results.items())), file=out)
+
+        print("\nmost played words (approximate)", file=out)
+        for word, count in self.words.top(top):
+            print(f"  {word:<24} {count}", file=out)
+
+        print("\nstage  moves  avg response  turns  eliminated", file=out)
+        for stage in sorted(set(self.response) | set(self.turns), key=lambda s: (s is None, s)):
+            total, moves = self.response.get(stage, (0.0, 0))
+            turns = self.turns.get(stage, 0)
+            eliminated = self.eliminations.get(stage, 0)
+            avg = f"{total / moves / 1000:.1f}s" if moves else "-"
+            rate = f"{eliminated} ({eliminated / turns:.1%})" if turns else "-"
+            print(f"{stage!s:>5}  {moves:>5}  {avg:>12}  {turns:>5}  {rate}", file=out)
+
+        print("\nwords per finished game", file=out)
+        lower = 0
+        for bound, count in zip(self.LENGTH_BINS + (None,), self.moves_hist):
+            label = f"{lower}-{bound}" if bound is not None else f"{lower}+"
+            print(f"  {label:<8} {count}", file=out)
+            lower = (bound or 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise word chain move logs")
+    parser.add_argument("paths", nargs="*", default=["moves"], help="log files or directories")
+    parser.add_argument("--top", type=int, default=10, help="most played words to list")
+    parser.add_argument("--capacity", type=int, default=10000,
+                        help="word counters to keep; more is more exact")
+    args = parser.parse_args()
+
+    summary = Summary(args.capacity)
+    for event in read_events(args.paths):
+        summary.add(event)
+    summary.report(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from metrics import call_api
+
+
+class Profile:
+    __slots__ = ('first_name', 'username')
+
+    def __init__(self, first_name, username=None):
+        self.first_name = first_name
+        self.username = username
+
+
+class ProfileCache:
+    """LRU cache of users' display names with a time-to-live.
+
+    Entries are added for free from incoming updates via ``remember``.
+    ``resolve`` fetches whatever is missing with ``get_chat`` concurrently,
+    at most ``concurrency`` requests at a time, and shares a fetch already
+    in flight for the same user.
+    """
+
+    def __init__(self, maxsize=10000, ttl=6 * 3600, concurrency=4):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (expires, Profile)
+        self._inflight = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, user_id, profile):
+        self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def remember(self, user):
+        if user is not None:
+            self.put(user.id, Profile(user.first_name, user.username))
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    async def _fetch(self, bot, user_id):
+        async with self._semaphore:
+            try:
+                chat = await call_api("getChat", bot.get_chat(user_id))
+            except Exception:
+                return Profile(str(user_id))
+        profile = Profile(chat.first_name, chat.username)
+        self.put(user_id, profile)
+        return profile
+
+    async def resolve(self, bot, user_ids):
+        """Map each of ``user_ids`` to its ``Profile``."""
+        found = {}
+        for user_id in user_ids:
+            profile = self.get(user_id)
+            if profile is not None:
+                found[user_id] = profile
+            elif user_id not in self._inflight:
+                task = asyncio.ensure_future(self._fetch(bot, user_id))
+                task.add_done_callback(lambda _, u=user_id: self._inflight.pop(u, None))
+                self._inflight[user_id] = task
+        missing = [u for u in user_ids if u not in found]
+        if missing:
+            tasks = [self._inflight[u] for u in missing]
+            profiles = await asyncio.gather(*(asyncio.shield(t) for t in tasks))
+            found.update(zip(missing, profiles))
+        return found
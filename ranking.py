@@ -0,0 +1,124 @@
+import time
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    """Users ordered by score, highest first, ties broken by user id.
+
+    Updating a user's score, finding a user's rank and reading the top K
+    are all O(log N + K); nothing ever sorts the whole table.
+    """
+
+    def __init__(self, items=()):
+        self._scores = dict(items)
+        self._order = SortedList((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._scores)
+
+    def get(self, user_id, default=0):
+        return self._scores.get(user_id, default)
+
+    def update(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._order.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._order.add((-score, user_id))
+
+    def clear(self):
+        self._scores.clear()
+        self._order.clear()
+
+    def rank(self, user_id):
+        """1-based rank of ``user_id``, or ``None`` if it has no score."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._order.index((-score, user_id)) + 1
+
+    def top(self, k):
+        return [(user_id, -neg) for neg, user_id in self._order.islice(0, k)]
+
+
+# Window -> strftime pattern of its bucket label. Labels of one window sort
+# in time order, so a newer bucket always compares greater.
+WINDOWS = {'day': 'd%Y-%m-%d', 'week': 'w%G-%V', 'month': 'm%Y-%m'}
+ALL_TIME = 'all'
+GLOBAL = 'global'
+_BY_PREFIX = {pattern[0]: window for window, pattern in WINDOWS.items()}
+
+
+class PeriodBoards:
+    """Leaderboards of the current day, week and month, overall and per
+    chat, plus every chat's all-time board.
+
+    Each board is a ``RankIndex`` keyed by ``(period, scope)``, where the
+    period is a bucket label such as ``w2026-42`` (or ``all``) and the scope
+    is ``global`` or a chat id. Trophies are added to every board they count
+    for as they are won. When a window rolls over its new bucket simply
+    starts empty and the expired ones are dropped from memory; their
+    totals stay in the database as the archive.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.boards = {}
+        self.current = {}  # window -> current label
+        self._day = None
+        self.roll()
+
+    def roll(self):
+        """Move to new buckets if a window has rolled over since the last
+        call; returns the expired ``(period, scope)`` keys."""
+        now = self.clock()
+        day = int(now // 86400)
+        if day == self._day:
+            return []
+        self._day = day
+        stamp = time.gmtime(now)
+        self.current = {window: time.strftime(pattern, stamp) for window, pattern in WINDOWS.items()}
+        expired = [key for key in self.boards if not self.is_current(key[0])]
+        for key in expired:
+            del self.boards[key]
+        return expired
+
+    def is_current(self, period):
+        """True for current and later buckets and for all-time boards."""
+        if period == ALL_TIME:
+            return True
+        label = self.current.get(_BY_PREFIX.get(period[:1]))
+        return label is not None and period >= label
+
+    def keys(self, chat_id=None):
+        self.roll()
+        keys = [(label, GLOBAL) for label in self.current.values()]
+        if chat_id is not None:
+            scope = str(chat_id)
+            keys.extend((label, scope) for label in self.current.values())
+            keys.append((ALL_TIME, scope))
+        return keys
+
+    def add(self, key, user_id, amount):
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = RankIndex()
+        board.update(user_id, board.get(user_id) + amount)
+
+    def set(self, key, user_id, score):
+        if self.is_current(key[0]):
+            board = self.boards.get(key)
+            if board is None:
+                board = self.boards[key] = RankIndex()
+            board.update(user_id, score)
+
+    def board(self, window, chat_id=None):
+        """The current board of ``window`` ('day', 'week', 'month' or, per
+        chat only, 'all'); empty if nobody has scored in it yet."""
+        self.roll()
+        period = ALL_TIME if window == ALL_TIME else self.current[window]
+        return self.boards.get((period, GLOBAL if chat_id is None else str(chat_id))) or RankIndex()
+
+    def clear(self):
+        self.boards.clear()
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from ranking import PeriodBoards, RankIndex
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteBackend:
+    """Scores in an SQLite database in WAL mode.
+
+    Every flush is one transaction, so after a crash the database holds
+    exactly the batches that were committed before it. Increments are
+    applied in SQL, so several processes can share one database.
+
+    Each batch stamps the rows it touches with the next sequence number
+    and a reset bumps the epoch, which lets ``changes_since`` hand other
+    processes just the rows that changed since they last looked.
+
+    Period and per-chat leaderboards live in ``board_scores``, one row per
+    bucket, scope and user. Rows of expired buckets are never deleted, so
+    the table doubles as their archive; ``reset`` leaves it alone.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores (user_id TEXT PRIMARY KEY, score INTEGER NOT NULL)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(scores)")]
+            if 'seq' not in columns:
+                self._conn.execute("ALTER TABLE scores ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS scores_seq ON scores (seq)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS board_scores (period TEXT NOT NULL, scope TEXT NOT NULL, "
+                "user_id TEXT NOT NULL, score INTEGER NOT NULL, seq INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (period, scope, user_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS board_scores_seq ON board_scores (seq)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('seq', 0), ('epoch', 0)")
+
+    def load(self):
+        return dict(self._conn.execute("SELECT user_id, score FROM scores"))
+
+    def apply(self, reset, deltas, boards=None):
+        with self._conn:
+            self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+            seq = self._conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+            if reset:
+                self._conn.execute("DELETE FROM scores")
+                self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'epoch'")
+            self._conn.executemany(
+                "INSERT INTO scores (user_id, score, seq) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET score = score + excluded.score, seq = excluded.seq",
+                [(user_id, amount, seq) for user_id, amount in deltas.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO board_scores (period, scope, user_id, score, seq) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(period, scope, user_id) DO UPDATE SET score = score + excluded.score, seq = excluded.seq",
+                [key + (amount, seq) for key, amount in (boards or {}).items()],
+            )
+
+    def changes_since(self, seq, epoch, periods=()):
+        """Return ``(seq, epoch, full, rows, board_rows)``: every score and
+        every board row of ``periods`` if ``full``, otherwise only rows
+        written after ``seq``."""
+        with self._conn:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            full = epoch != meta['epoch']
+            if full:
+                rows = self._conn.execute("SELECT user_id, score FROM scores").fetchall()
+                periods = list(periods) + ['all']
+                board_rows = self._conn.execute(
+                    "SELECT period, scope, user_id, score FROM board_scores WHERE period IN (%s)"
+                    % ",".join("?" * len(periods)), periods
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT user_id, score FROM scores WHERE seq > ?", (seq,)).fetchall()
+                board_rows = self._conn.execute(
+                    "SELECT period, scope, user_id, score FROM board_scores WHERE seq > ?", (seq,)
+                ).fetchall()
+        return meta['seq'], meta['epoch'], full, rows, board_rows
+
+    def close(self):
+        self._conn.close()
+
+
+class JsonBackend:
+    """Scores in a JSON file, rewritten atomically on every flush."""
+
+    def __init__(self, path):
+        self.path = path
+        self._scores = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self._scores = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._scores = {}
+        return dict(self._scores)
+
+    def apply(self, reset, deltas, boards=None):
+        # Period boards are not kept in the legacy format
+        if reset:
+            self._scores = {}
+        for user_id, amount in deltas.items():
+            self._scores[user_id] = self._scores.get(user_id, 0) + amount
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._scores, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def changes_since(self, seq, epoch, periods=()):
+        # Only this process writes the file, so memory is always current
+        if epoch is None:
+            return 0, 0, True, list(self.load().items()), []
+        return seq, epoch, False, [], []
+
+    def close(self):
+        pass
+
+
+class ScoreStore:
+    """In-memory scores persisted to a backend in batches.
+
+    ``add`` and ``reset`` only touch memory and a pending batch, so they are
+    cheap to call from game code on the event loop. The batch is written by
+    ``flush`` in a worker thread, either every ``flush_interval`` seconds
+    (once ``start`` has been called) or as soon as ``flush_size`` users are
+    waiting to be written. ``ranks`` is kept in step with every change for
+    rank and top-K queries, and ``boards`` holds the current period and
+    per-chat leaderboards fed by the same ``add``. After each flush the
+    store also pulls in rows other processes wrote to the same backend.
+    """
+
+    def __init__(self, backend, flush_interval=5.0, flush_size=200):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.scores = {}
+        self.ranks = RankIndex()
+        self.boards = PeriodBoards()
+        self._pending = {}
+        self._board_pending = {}  # (period, scope, user_id) -> trophies
+        self._reset_pending = False
+        self._seq = self._epoch = None
+        self._merge(backend.changes_since(None, None, self.boards.current.values()))
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._kick = None
+        self.flushes = 0
+        self.flush_seconds = 0.0
+
+    def get(self, user_id):
+        return self.scores.get(str(user_id), 0)
+
+    def items(self):
+        return self.scores.items()
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def add(self, user_id, amount, chat_id=None):
+        """Award trophies, counting them on ``chat_id``'s boards too."""
+        user_id = str(user_id)
+        self.scores[user_id] = self.scores.get(user_id, 0) + amount
+        self.ranks.update(user_id, self.scores[user_id])
+        self._pending[user_id] = self._pending.get(user_id, 0) + amount
+        for key in self.boards.keys(chat_id):
+            self.boards.add(key, user_id, amount)
+            pending_key = key + (user_id,)
+            self._board_pending[pending_key] = self._board_pending.get(pending_key, 0) + amount
+        if len(self._pending) >= self.flush_size and not (self._kick and not self._kick.done()):
+            try:
+                self._kick = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+        return self.scores[user_id]
+
+    def reset(self):
+        self.scores.clear()
+        self.ranks.clear()
+        self._pending = {}
+        self._reset_pending = True
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending and not self._board_pending and not self._reset_pending:
+                return
+            reset, deltas, boards = self._reset_pending, self._pending, self._board_pending
+            self._reset_pending, self._pending, self._board_pending = False, {}, {}
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.backend.apply, reset, deltas, boards)
+            except Exception:
+                self._requeue(reset, deltas, boards)
+                raise
+            finally:
+                self.flushes += 1
+                self.flush_seconds += time.perf_counter() - start
+
+    def _merge(self, changes):
+        self._seq, self._epoch, full, rows, board_rows = changes
+        if full:
+            self.scores.clear()
+            self.ranks.clear()
+            self.boards.clear()
+        for user_id, score in rows:
+            # Keep our own unflushed trophies on top of the stored total
+            score += self._pending.get(user_id, 0)
+            self.scores[user_id] = score
+            self.ranks.update(user_id, score)
+        for period, scope, user_id, score in board_rows:
+            score += self._board_pending.get((period, scope, user_id), 0)
+            self.boards.set((period, scope), user_id, score)
+
+    async def refresh(self):
+        async with self._flush_lock:
+            if self._reset_pending:
+                return
+            self._merge(await asyncio.to_thread(
+                self.backend.changes_since, self._seq, self._epoch, list(self.boards.current.values())
+            ))
+
+    def _requeue(self, reset, deltas, boards):
+        for key, amount in boards.items():
+            self._board_pending[key] = self._board_pending.get(key, 0) + amount
+        # A reset queued since the failed batch makes its changes moot
+        if self._reset_pending:
+            return
+        self._reset_pending = reset
+        for user_id, amount in deltas.items():
+            self._pending[user_id] = self._pending.get(user_id, 0) + amount
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self.refresh()
+            except Exception:
+                logger.exception("Score flush failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        self.backend.close()
+
+
+def open_store(path='scores.db', legacy_json='score.json', **kwargs):
+    """Open the SQLite store, importing scores from the old JSON file once."""
+    fresh = not os.path.exists(path)
+    backend = SQLiteBackend(path)
+    if fresh and os.path.exists(legacy_json):
+        legacy = JsonBackend(legacy_json).load()
+        if legacy:
+            backend.apply(False, legacy)
+    return ScoreStore(backend, **kwargs)
@@ -0,0 +1,229 @@
+"""Sharded deployment: one front process, N game workers.
+
+The front receives updates (long polling or webhook) and forwards each
+one to the worker that owns its chat, ``chat_id % WORKERS``, so a chat
+always lands on the same worker and its updates arrive in order. Every
+worker is a full bot with its own ``active_games``, timers and outbound
+queue; they share the mmap'd lexicon through the page cache and the
+scores database through SQLite.
+
+Workers report who is on turn in each chat back to the front, which
+drops group chatter before it is ever serialized to a worker.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+
+from telegram import Bot, Update
+from telegram.error import InvalidToken, RetryAfter, TelegramError
+
+import config
+from chatlocks import OrderedTasks
+from dispatcher import retry_delay
+from metrics import call_api
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(chat_id, count):
+    return chat_id % count
+
+
+def route_key(update):
+    """The id an update is sharded by: its chat, else its sender."""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+def is_chatter(update, turns):
+    """Whether ``update`` is a group message no handler acts on: neither a
+    command nor from the player on turn (``turns`` maps chat to player)."""
+    message = update.message
+    if message is None or message.chat.type not in ("group", "supergroup"):
+        return False
+    if message.text and message.text.startswith("/"):
+        return False
+    user = message.from_user
+    return user is None or turns.get(message.chat_id) != user.id
+
+
+class ReportedTurns(dict):
+    """A worker's ``current_turns`` that sends every change to the front."""
+
+    def __init__(self, channel):
+        super().__init__()
+        self.channel = channel
+
+    def __setitem__(self, chat_id, user_id):
+        super().__setitem__(chat_id, user_id)
+        self.channel.put((chat_id, user_id))
+
+    def pop(self, chat_id, *default):
+        if chat_id in self:
+            self.channel.put((chat_id, None))
+        return super().pop(chat_id, *default)
+
+
+class Router:
+    """Starts the workers and feeds them updates through bounded queues.
+
+    A full queue blocks the caller (off the event loop), which in turn
+    stalls polling or, in webhook mode, the HTTP response to Telegram.
+    ``turns`` mirrors the workers' players on turn, applied by a thread
+    as they report changes, and chatter is dropped (counted in
+    ``dropped``) instead of routed.
+    """
+
+    def __init__(self, target, count, maxsize=1000):
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue(maxsize) for _ in range(count)]
+        self.reports = context.Queue()
+        self.turns = {}
+        self.dropped = 0
+        self.workers = [
+            context.Process(target=target, args=(index, count, q, self.reports), name=f"shard-{index}")
+            for index, q in enumerate(self.queues)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self._follower = threading.Thread(target=self._follow, name="turns", daemon=True)
+        self._follower.start()
+
+    def _follow(self):
+        while True:
+            report = self.reports.get()
+            if report is None:
+                return
+            chat_id, user_id = report
+            if user_id is None:
+                self.turns.pop(chat_id, None)
+            else:
+                self.turns[chat_id] = user_id
+
+    async def route(self, update):
+        if is_chatter(update, self.turns):
+            self.dropped += 1
+            return
+        q = self.queues[shard_of(route_key(update), len(self.queues))]
+        data = update.to_dict()
+        try:
+            q.put_nowait(data)
+        except queue.Full:
+            await asyncio.to_thread(q.put, data)
+
+    async def close(self, timeout=30):
+        for q in self.queues:
+            await asyncio.to_thread(q.put, None)
+        for worker in self.workers:
+            await asyncio.to_thread(worker.join, timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self.reports.put(None)
+        await asyncio.to_thread(self._follower.join, timeout)
+
+
+async def poll(bot, router, stop, max_backoff=30):
+    """Long-poll for updates and route them until ``stop`` is set.
+
+    Flood waits are honoured and other API errors retried with exponential
+    backoff; an invalid token can't recover and is raised.
+    """
+    offset = None
+    backoff = 1
+    while not stop.is_set():
+        try:
+            updates = await call_api("getUpdates", bot.get_updates(
+                offset=offset, timeout=10, allowed_updates=Update.ALL_TYPES))
+        except InvalidToken:
+            raise
+        except RetryAfter as e:
+            logger.warning("Polling flood-limited, waiting %ss", retry_delay(e))
+            await asyncio.sleep(retry_delay(e))
+            continue
+        except TelegramError as e:
+            logger.warning("Polling failed: %s; retrying in %ss", e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+            continue
+        backoff = 1
+        for update in updates:
+            await router.route(update)
+            offset = update.update_id + 1
+
+
+async def run_front(target, count):
+    bot = Bot(config.BOT_TOKEN)
+    await bot.initialize()
+    router = Router(target, count, config.SHARD_QUEUE_SIZE)
+    print(f"Routing updates to {count} workers")
+    try:
+        if config.BOT_MODE == "webhook":
+            from webhook import listen, make_server, wait_for_signal
+            server = make_server(bot, router.route)
+            runner = await listen(server)
+            try:
+                await wait_for_signal()
+            finally:
+                await runner.cleanup()
+                await server.drain()
+        else:
+            await call_api("deleteWebhook", bot.delete_webhook())
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            polling = asyncio.create_task(poll(bot, router, stop))
+            # Polling only ends by itself on an error it can't retry; shut
+            # down then rather than wait for updates that will never come
+            polling.add_done_callback(lambda _: stop.set())
+            await stop.wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+            if not polling.cancelled():
+                polling.result()
+    finally:
+        await router.close()
+        await bot.shutdown()
+
+
+async def consume(application, q, max_pending=1000):
+    """Run updates from the front through ``application`` until ``None`` arrives."""
+    tasks = OrderedTasks(max_pending)
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        while True:
+            batch = [await asyncio.to_thread(q.get)]
+            try:
+                while len(batch) < 100:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+            for data in batch:
+                if data is None:
+                    return
+                update = Update.de_json(data, application.bot)
+                await tasks.submit(route_key(update), application.process_update, update)
+    finally:
+        await tasks.drain()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_worker(application, q):
+    # Ctrl-C reaches the whole process group; only the front reacts to it
+    # and then shuts the workers down in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(consume(application, q, config.WEBHOOK_MAX_PENDING))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotLog:
+    """Append-only log of game snapshots, one JSON line per change.
+
+    ``mark`` and ``forget`` only note which chats changed. Every
+    ``interval`` seconds ``flush`` serializes those games on the event loop
+    and appends the lines from a worker thread; a crash loses at most that
+    window. The newest line per chat wins on ``load``, and once the log is
+    ``compact_ratio`` times larger than the live snapshots it is rewritten
+    with just those.
+    """
+
+    def __init__(self, path, interval=0.5, compact_ratio=4, min_compact_bytes=1 << 20):
+        self.path = path
+        self.interval = interval
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self._dirty = {}  # chat_id -> game, or None once the game is gone
+        self._latest = {}  # chat_id -> last line written
+        self._live_bytes = 0
+        self._log_bytes = 0
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def __len__(self):
+        return len(self._latest)
+
+    def load(self):
+        """Read the log and return ``{chat_id: snapshot}`` for live games."""
+        self._latest = {}
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn write at the end of the log
+                    if record.get('game') is None:
+                        self._latest.pop(record['chat'], None)
+                    else:
+                        self._latest[record['chat']] = line.decode('utf-8').rstrip('\n')
+                self._log_bytes = f.tell()
+        except FileNotFoundError:
+            self._log_bytes = 0
+        self._live_bytes = sum(len(line) + 1 for line in self._latest.values())
+        return {chat_id: json.loads(line)['game'] for chat_id, line in self._latest.items()}
+
+    def mark(self, game):
+        self._dirty[game.chat_id] = game
+
+    def forget(self, chat_id):
+        self._dirty[chat_id] = None
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            lines = []
+            for chat_id, game in dirty.items():
+                if game is None:
+                    if self._latest.pop(chat_id, None) is None:
+                        continue
+                    line = json.dumps({'chat': chat_id, 'game': None})
+                else:
+                    line = json.dumps({'chat': chat_id, 'game': game.snapshot()}, separators=(',', ':'))
+                    self._latest[chat_id] = line
+                lines.append(line)
+            if not lines:
+                return
+            self._live_bytes = sum(len(line) + 1 for line in self._latest.values())
+            if self._log_bytes > max(self.min_compact_bytes, self.compact_ratio * self._live_bytes):
+                await asyncio.to_thread(self._rewrite, list(self._latest.values()))
+            else:
+                await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines):
+        data = ''.join(line + '\n' for line in lines)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_bytes += len(data)
+
+    def _rewrite(self, lines):
+        tmp = self.path + '.tmp'
+        data = ''.join(line + '\n' for line in lines)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._log_bytes = len(data)
+
+    async def compact(self):
+        async with self._flush_lock:
+            await asyncio.to_thread(self._rewrite, list(self._latest.values()))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Snapshot flush failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
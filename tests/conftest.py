@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The bot is a set of top-level modules, not a package
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    """The ``bot`` module, imported in a scratch directory so its scores
+    database, snapshots and move log stay out of the checkout."""
+    workdir = tmp_path_factory.mktemp("bot")
+    for name in ("words.txt", "words.bin", "words.fuzzy"):
+        if os.path.exists(os.path.join(ROOT, name)):
+            os.symlink(os.path.join(ROOT, name), workdir / name)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import bot
+        import config
+        config.BOT_TOKEN = config.BOT_TOKEN or "123:test"
+        yield bot
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,115 @@
+import asyncio
+import queue
+
+from telegram import Update
+from telegram.ext import Application, ExtBot
+
+import metrics
+import shards
+
+CHAT = -100
+
+
+def message(update_id, text, user_id, chat_id=CHAT, chat_type="group"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": chat_type},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"},
+            "text": text,
+        },
+    }
+
+
+def handler_calls():
+    return {key[0]: entry[2] for key, entry in metrics.HANDLER_LATENCY._values.items()}
+
+
+def test_chatter_never_reaches_a_handler(bot, monkeypatch):
+    async def offline(self):
+        pass
+
+    # Application.initialize would call getMe
+    monkeypatch.setattr(ExtBot, "initialize", offline)
+    monkeypatch.setattr(ExtBot, "shutdown", offline)
+    monkeypatch.setitem(bot.current_turns, CHAT, 7)
+
+    async def run():
+        app = bot.build_application(Application.builder().updater(None))
+        await app.initialize()
+        before = handler_calls()
+        for i in range(5):
+            await app.process_update(Update.de_json(message(i, "hello there", user_id=8), app.bot))
+        chatter = handler_calls()
+        # The player on turn still gets through
+        await app.process_update(Update.de_json(message(5, "apple", user_id=7), app.bot))
+        await app.shutdown()
+        return before, chatter, handler_calls()
+
+    before, chatter, after = asyncio.run(run())
+    assert chatter == before
+    assert after.get("handle_message", 0) == before.get("handle_message", 0) + 1
+    assert sum(after.values()) == sum(before.values()) + 1
+
+
+def test_front_drops_chatter():
+    turns = {CHAT: 7}
+
+    def chatter(data):
+        return shards.is_chatter(Update.de_json(data, None), turns)
+
+    assert chatter(message(1, "hello there", user_id=8))
+    assert chatter(message(2, "hello", user_id=8, chat_id=-200))
+    assert not chatter(message(3, "apple", user_id=7))
+    assert not chatter(message(4, "/score", user_id=8))
+    assert not chatter(message(5, "hi", user_id=8, chat_id=8, chat_type="private"))
+    assert not chatter({"update_id": 6})
+
+
+def test_worker_reports_turn_changes():
+    reports = queue.Queue()
+    turns = shards.ReportedTurns(reports)
+    turns[CHAT] = 7
+    turns[CHAT] = 8
+    assert turns.pop(CHAT, None) == 8
+    assert turns.pop(CHAT, None) is None
+    assert [reports.get_nowait() for _ in range(reports.qsize())] == [(CHAT, 7), (CHAT, 8), (CHAT, None)]
+
+
+def test_queued_messages_are_sent_before_the_bot_shuts_down(bot, monkeypatch):
+    sent, shut_down = [], []
+
+    async def offline(self):
+        pass
+
+    async def closed(self):
+        shut_down.append(True)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        assert not shut_down, "sent after the HTTP client was closed"
+        sent.append(text)
+
+    monkeypatch.setattr(ExtBot, "initialize", offline)
+    monkeypatch.setattr(ExtBot, "shutdown", closed)
+    monkeypatch.setattr(ExtBot, "send_message", send_message)
+
+    async def run():
+        app = bot.build_application(Application.builder().updater(None))
+        await app.initialize()
+        # Separate sends that use up the chat's burst, so its bucket would
+        # take seconds to refill
+        for i in range(3):
+            bot.outbound.send(app.bot, CHAT, f"message {i}", reply_to_message_id=i + 1)
+        start = asyncio.get_running_loop().time()
+        await app.post_stop(app)
+        stopped_in = asyncio.get_running_loop().time() - start
+        await app.shutdown()
+        return stopped_in
+
+    stopped_in = asyncio.run(run())
+    assert sent == ["message 0", "message 1", "message 2"]
+    assert len(bot.outbound) == 0
+    # The chat worker stops once its queue is empty, not when its bucket refills
+    assert stopped_in < 2
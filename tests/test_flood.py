@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+from flood import FloodControl
+
+CHAT = -300
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+
+
+def test_notices_collapse_and_count_skipped(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("flood.time.monotonic", lambda: clock[0])
+    flood = FloodControl([1], [3], [10], [10], notice_window=5)
+    assert flood.notice(CHAT, 1, 0) == 0
+    assert flood.notice(CHAT, 1, 0) is None
+    assert flood.notice(CHAT, 1, 0) is None
+    clock[0] += 6
+    assert flood.notice(CHAT, 1, 0) == 2
+
+
+def test_first_drop_after_a_rejection_is_answered(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("flood.time.monotonic", lambda: clock[0])
+    flood = FloodControl([1], [3], [10], [10], notice_window=5)
+    assert flood.notice(CHAT, 1, 0) == 0
+    assert flood.notice(CHAT, 1, 0) is None
+    # A dropped word still gets its own reply, counting the skipped rejection
+    assert flood.notice(CHAT, 1, 0, dropped=True) == 1
+    assert flood.notice(CHAT, 1, 0, dropped=True) is None
+    assert flood.notice(CHAT, 1, 0) is None
+    clock[0] += 6
+    assert flood.notice(CHAT, 1, 0) == 2
+
+
+def test_word_dropped_after_typos_is_not_silent(bot, monkeypatch):
+    fake = RecordingBot()
+    context = SimpleNamespace(bot=fake, args=[])
+    monkeypatch.setattr(bot, "flood", FloodControl([0.001], [3], [100], [100], notice_window=5))
+    monkeypatch.setattr(bot.outbound, "chat_rate", 1e9)
+    monkeypatch.setattr(bot.outbound, "chat_burst", 1e9)
+    message_ids = iter(range(1, 1000))
+    lookups = []
+    suggest = bot.GameState.suggest
+
+    def counted_suggest(game, word):
+        lookups.append(word)
+        return suggest(game, word)
+
+    monkeypatch.setattr(bot.GameState, "suggest", counted_suggest)
+
+    def update(user, text):
+        return SimpleNamespace(
+            effective_chat=SimpleNamespace(id=CHAT, type="group"),
+            effective_user=user,
+            message=SimpleNamespace(chat_id=CHAT, text=text, message_id=next(message_ids)),
+        )
+
+    players = [SimpleNamespace(id=CHAT * 10 - seat, first_name=f"P{seat}", username=None) for seat in range(2)]
+
+    async def run():
+        await bot.startclassic(update(players[0], "/startclassic"), context)
+        for player in players:
+            await bot.join(update(player, "/join"), context)
+        game = bot.active_games[CHAT]
+        game.join_timer.cancel()
+        await bot.start_joining(CHAT, fake)
+        await bot.outbound.drain()
+        fake.sent.clear()
+
+        player = game.players[game.current_player_index]
+        min_length, _ = game.get_round_params()
+        word = game.lexicon.random_word(min_length, first=game.current_word[-1])
+        for typo in ("qzxqzx", "qzxqzy", "qzxqzz"):
+            await bot.handle_message(update(player, typo), context)
+        # The player's bucket is empty: their good word is dropped
+        await bot.handle_message(update(player, word), context)
+        await bot.outbound.drain()
+        played = word in game.used_words
+
+        await bot.discard_game(game)
+        await bot.outbound.close()
+        await bot.timers.close()
+        return played
+
+    played = asyncio.run(run())
+    text = "\n\n".join(fake.sent)
+    assert not played
+    assert text.count("Not in the word list") == 1
+    assert "That word was ignored" in text
+    assert "2 more ignored or rejected" in text
+    # Suggestions are only looked up for the rejection that was answered
+    assert lookups == ["qzxqzx"]
+    assert bot.flood.dropped == {("user",): 1}
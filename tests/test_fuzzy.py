@@ -0,0 +1,48 @@
+import zlib
+
+import fuzzy
+from fuzzy import SuggestIndex, pack, sorted_keys
+from lexicon import Lexicon
+
+
+def index_of(words):
+    lexicon = Lexicon.from_words(words)
+    return SuggestIndex(lexicon, pack(lexicon))
+
+
+def test_suggests_words_within_two_edits():
+    index = index_of(["cat", "cart", "coat", "dog"])
+    assert index.suggest("cst") == ["cat"]
+    assert index.suggest("cat", limit=5) == ["cart", "coat"]
+    assert index.suggest("caaaat") == []
+
+
+def test_words_too_long_to_be_typos_are_not_looked_up(monkeypatch):
+    index = index_of(["cat", "cart", "coat"])
+    monkeypatch.setattr(index, "_candidates", lambda word: 1 / 0)
+    assert index.suggest("c" * 10_000) == []
+
+
+def test_keys_are_sorted_like_a_plain_sort():
+    words = ["cat", "cart", "coat", "dog", "dig", "doge", "a", "zebra"]
+    lexicon = Lexicon.from_words(words)
+    expected = sorted(
+        zlib.crc32(v.encode('utf-8')) << 32 | i
+        for i, word in enumerate(lexicon)
+        for v in {word} | {word[:j] + word[j + 1:] for j in range(len(word))}
+    )
+    assert list(sorted_keys(lexicon)) == expected
+
+
+def test_unreadable_index_is_not_rebuilt_over_the_key_limit(tmp_path, monkeypatch):
+    lexicon = Lexicon.from_words(["cat", "cart", "coat"])
+    compiled = tmp_path / "words.bin"
+    compiled.write_bytes(b"")
+    target = tmp_path / "words.fuzzy"
+    target.write_bytes(b"not a suggestion index")
+    assert fuzzy.load(lexicon, str(compiled)).suggest("cst") == ["cat"]
+
+    target.write_bytes(b"not a suggestion index")
+    monkeypatch.setattr(fuzzy, "MAX_KEYS", 5)
+    assert fuzzy.load(lexicon, str(compiled)) is None
+    assert target.read_bytes() == b"not a suggestion index"
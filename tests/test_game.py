@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram import User
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_restored_games_announce_the_current_turn(bot, monkeypatch):
+    monkeypatch.setattr(bot.outbound, "chat_rate", 1e9)
+    monkeypatch.setattr(bot.outbound, "chat_burst", 1e9)
+    sender = RecordingBot()
+
+    async def run():
+        lexicon = await bot.lexicons.get("en")
+        game = bot.GameState(-50, sender, "en", lexicon)
+        game.players = [User(1, "Ann", False), User(2, "Bob", False)]
+        game.state = "playing"
+        game.current_player_index = 1
+        game.current_word = "abandonment"
+        game.used_words = {"abandonment"}
+        data = game.snapshot()
+        data["turn_remaining"] = 12.3
+        monkeypatch.setattr(bot.snapshots, "load", lambda: {-50: data})
+        await bot.restore_games(sender)
+        restored = bot.active_games.pop(-50)
+        restored.cancel_timers()
+        await bot.outbound.drain()
+        await bot.outbound.close()
+        await bot.timers.close()
+        return restored
+
+    restored = asyncio.run(run())
+    assert bot.current_turns.pop(-50) == 2
+    assert restored.turn_timer is not None
+    text = "\n".join(text for _, text in sender.sent)
+    assert "Back online" in text
+    assert "Bob'S TURN" in text
+    assert "Timeout: 13s" in text
+
+
+def dead_end_game(bot, words, used, current):
+    lexicon = bot.lexicon_store.Lexicon.from_words(words)
+    game = bot.GameState(-60, RecordingBot(), "en", lexicon)
+    game.players = [User(1, "Ann", False), User(2, "Bob", False)]
+    game.state = "playing"
+    for word in used:
+        game.use_word(word)
+    game.current_word = current
+    return game
+
+
+def play_next_turn(bot, game, monkeypatch):
+    monkeypatch.setattr(bot.outbound, "chat_rate", 1e9)
+    monkeypatch.setattr(bot.outbound, "chat_burst", 1e9)
+
+    async def run():
+        game.next_turn()
+        game.cancel_timers()
+        await bot.outbound.drain()
+        await bot.outbound.close()
+        await bot.timers.close()
+
+    asyncio.run(run())
+    bot.current_turns.pop(game.chat_id, None)
+    return "\n".join(text for _, text in game.bot.sent)
+
+
+def test_dead_end_falls_back_to_scanning_the_word_list(bot, monkeypatch):
+    game = dead_end_game(bot, ["abc", "xyd", "dex"], ["abc"], "abc")
+    # Every random pick is a used word
+    monkeypatch.setattr(game.lexicon, "random_word", lambda *args, **kwargs: "abc")
+    text = play_next_turn(bot, game, monkeypatch)
+    assert game.state == "playing"
+    assert game.current_word in ("xyd", "dex")
+    assert "No words left starting with C" in text
+    assert "Words Left: 1" in text
+
+
+def test_dead_end_with_nothing_left_ends_the_game(bot, monkeypatch):
+    # "bob" is unused, but playing it would leave nothing starting with b
+    game = dead_end_game(bot, ["abc", "cxa", "bob"], ["abc", "cxa"], "cxa")
+    text = play_next_turn(bot, game, monkeypatch)
+    assert game.state == "ended"
+    assert game.turn_timer is None or not game.turn_timer.active
+    assert "draw" in text
+    assert "TURN" not in text
@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+
+class QuietBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        pass
+
+
+def test_group_boards_are_cached_in_bounded_lru(bot, monkeypatch):
+    monkeypatch.setattr(bot, "LEADERBOARD_CACHE_SIZE", 3)
+    monkeypatch.setattr(bot.outbound, "chat_rate", 1e9)
+    monkeypatch.setattr(bot.outbound, "chat_burst", 1e9)
+    bot.leaderboard_cache.clear()
+    context = SimpleNamespace(bot=QuietBot(), args=["week", "group"])
+
+    def update(chat_id):
+        return SimpleNamespace(
+            effective_chat=SimpleNamespace(id=chat_id, type="group"),
+            effective_user=SimpleNamespace(id=chat_id * -10, first_name="Ann", username=None),
+        )
+
+    async def run():
+        for chat_id in (-1, -2, -3, -1, -4):
+            await bot.leaderboard(update(chat_id), context)
+        await bot.outbound.drain()
+        await bot.outbound.close()
+
+    asyncio.run(run())
+    # -2 was the least recently used when -4 came in
+    assert list(bot.leaderboard_cache) == [("week", -3), ("week", -1), ("week", -4)]
+    assert bot.profiles.get(10).first_name == "Ann"
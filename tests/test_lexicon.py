@@ -0,0 +1,52 @@
+import os
+
+from lexicon import Lexicon, cached, load
+
+
+def test_cached_rebuilds_missing_stale_and_unreadable_files(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("cat\n")
+    target = tmp_path / "words.out"
+    writes = []
+
+    def write(f):
+        writes.append(source.read_text())
+        f.write(b"ok " + source.read_bytes())
+
+    def read(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(b"ok "):
+            raise ValueError("not ours")
+        return data
+
+    assert cached(str(source), str(target), write, read) == b"ok cat\n"
+    assert cached(str(source), str(target), write, read) == b"ok cat\n"
+    assert len(writes) == 1
+
+    source.write_text("dog\n")
+    os.utime(target, (0, 0))
+    assert cached(str(source), str(target), write, read) == b"ok dog\n"
+
+    target.write_bytes(b"garbage")
+    assert cached(str(source), str(target), write, read) == b"ok dog\n"
+    assert len(writes) == 3
+    assert sorted(os.listdir(tmp_path)) == ["words.out", "words.txt"]
+
+
+def test_cached_write_can_decline(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("cat\n")
+    target = tmp_path / "words.out"
+    assert cached(str(source), str(target), lambda f: False, open) is None
+    # Neither the target nor a temporary file is left behind
+    assert os.listdir(tmp_path) == ["words.txt"]
+
+
+def test_load_compiles_the_word_list(tmp_path):
+    source = tmp_path / "words.txt"
+    source.write_text("Cat\ncart\n\ndog\n")
+    lexicon = load(str(source))
+    assert isinstance(lexicon, Lexicon)
+    assert sorted(lexicon) == ["cart", "cat", "dog"]
+    assert (tmp_path / "words.bin").exists()
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from metrics import API_ERRORS, call_api, error_code
+
+
+def test_error_code():
+    assert error_code(RetryAfter(5)) == 429
+    assert error_code(BadRequest("message is too long")) == 400
+    assert error_code(Forbidden("bot was blocked by the user")) == 403
+    assert error_code(NetworkError("connection reset")) == ""
+
+
+def test_call_api_labels_errors_by_code():
+    async def flooded():
+        raise RetryAfter(3)
+
+    async def bad():
+        raise BadRequest("chat not found")
+
+    before_429 = API_ERRORS._values.get(("sendMessage", "RetryAfter", 429), 0)
+    before_400 = API_ERRORS._values.get(("sendMessage", "BadRequest", 400), 0)
+    for coro in (flooded(), bad()):
+        with pytest.raises(Exception):
+            asyncio.run(call_api("sendMessage", coro))
+    assert API_ERRORS._values[("sendMessage", "RetryAfter", 429)] == before_429 + 1
+    assert API_ERRORS._values[("sendMessage", "BadRequest", 400)] == before_400 + 1
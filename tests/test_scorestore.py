@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from scorestore import JsonBackend, SQLiteBackend, ScoreStore, open_store
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_add_stays_in_memory_until_flushed(tmp_path):
+    store = ScoreStore(SQLiteBackend(str(tmp_path / "scores.db")))
+    assert store.add(1, 10) == 10
+    assert store.add(1, 5) == 15
+    assert store.pending == 1
+    assert SQLiteBackend(str(tmp_path / "scores.db")).load() == {}
+
+    run(store.flush())
+    assert store.pending == 0
+    assert store.flushes == 1
+    assert SQLiteBackend(str(tmp_path / "scores.db")).load() == {"1": 15}
+
+
+def test_scores_survive_reopening(tmp_path):
+    path = str(tmp_path / "scores.db")
+    store = ScoreStore(SQLiteBackend(path))
+    store.add(1, 10)
+    store.add(2, 30)
+    run(store.close())
+
+    store = ScoreStore(SQLiteBackend(path))
+    assert store.get(1) == 10
+    assert store.ranks.top(2) == [("2", 30), ("1", 10)]
+
+
+def test_full_batch_flushes_at_once(tmp_path):
+    path = str(tmp_path / "scores.db")
+    store = ScoreStore(SQLiteBackend(path), flush_size=3)
+
+    async def award():
+        for user_id in range(3):
+            store.add(user_id, 10)
+        await store._kick
+
+    run(award())
+    assert SQLiteBackend(path).load() == {"0": 10, "1": 10, "2": 10}
+
+
+class FailingBackend(JsonBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.fail = True
+
+    def apply(self, reset, deltas, boards=None):
+        if self.fail:
+            raise OSError("disk full")
+        super().apply(reset, deltas, boards)
+
+
+def test_failed_flush_is_requeued(tmp_path):
+    backend = FailingBackend(str(tmp_path / "score.json"))
+    store = ScoreStore(backend)
+    store.add(1, 10)
+    with pytest.raises(OSError):
+        run(store.flush())
+    store.add(1, 5)
+    assert store.pending == 1
+
+    backend.fail = False
+    run(store.flush())
+    assert JsonBackend(backend.path).load() == {"1": 15}
+
+
+def test_reset_queued_after_a_failed_batch_wins(tmp_path):
+    backend = FailingBackend(str(tmp_path / "score.json"))
+    store = ScoreStore(backend)
+    store.add(1, 10)
+    with pytest.raises(OSError):
+        run(store.flush())
+    store.reset()
+    store.add(2, 5)
+
+    backend.fail = False
+    run(store.flush())
+    assert JsonBackend(backend.path).load() == {"2": 5}
+
+
+def test_processes_sharing_a_database_sync(tmp_path):
+    path = str(tmp_path / "scores.db")
+    first = ScoreStore(SQLiteBackend(path))
+    second = ScoreStore(SQLiteBackend(path))
+
+    first.add(1, 10, chat_id=-100)
+    second.add(2, 20)
+    run(first.flush())
+    run(second.flush())
+    run(first.refresh())
+    run(second.refresh())
+    for store in (first, second):
+        assert store.get(1) == 10 and store.get(2) == 20
+        assert store.ranks.rank("2") == 1
+
+    # Unflushed trophies stay on top of what the other process wrote
+    second.add(1, 5)
+    first.add(1, 10)
+    run(first.flush())
+    run(second.refresh())
+    assert second.get(1) == 25
+
+
+def test_reset_bumps_the_epoch_for_other_processes(tmp_path):
+    path = str(tmp_path / "scores.db")
+    first = ScoreStore(SQLiteBackend(path))
+    second = ScoreStore(SQLiteBackend(path))
+    first.add(1, 10)
+    run(first.flush())
+    run(second.refresh())
+    assert second.get(1) == 10
+
+    first.reset()
+    first.add(2, 5)
+    run(first.flush())
+    run(second.refresh())
+    assert dict(second.items()) == {"2": 5}
+    assert second.ranks.rank("1") is None
+
+
+def test_period_boards_are_persisted(tmp_path):
+    path = str(tmp_path / "scores.db")
+    store = ScoreStore(SQLiteBackend(path))
+    store.add(1, 10, chat_id=-100)
+    run(store.close())
+
+    store = ScoreStore(SQLiteBackend(path))
+    assert store.boards.board("month").top(1) == [("1", 10)]
+    assert store.boards.board("week", -100).top(1) == [("1", 10)]
+    assert store.boards.board("day", -200).top(1) == []
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "score.json"
+    legacy.write_text('{"1": 40, "2": 7}')
+    db = str(tmp_path / "scores.db")
+    store = open_store(db, legacy_json=str(legacy))
+    assert store.get(1) == 40
+    store.add(1, 10)
+    run(store.close())
+
+    legacy.write_text('{"1": 999}')
+    store = open_store(db, legacy_json=str(legacy))
+    assert store.get(1) == 50
+    run(store.close())
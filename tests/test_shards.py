@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from telegram import Update
+from telegram.error import Conflict, InvalidToken, NetworkError, RetryAfter
+
+import shards
+
+
+class FlakyBot:
+    """Answers ``get_updates`` from a script of results and errors."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def get_updates(self, offset=None, **kwargs):
+        self.calls += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return [Update(update_id) for update_id in step]
+
+
+class Recorder:
+    def __init__(self):
+        self.routed = []
+
+    async def route(self, update):
+        self.routed.append(update.update_id)
+
+
+def run_poll(script, monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(shards.asyncio, "sleep", no_sleep)
+    bot, router = FlakyBot(script), Recorder()
+    with pytest.raises(InvalidToken):
+        asyncio.run(shards.poll(bot, router, asyncio.Event()))
+    return bot, router
+
+
+def test_poll_retries_api_errors(monkeypatch):
+    script = [RetryAfter(2), [1, 2], Conflict("terminated by other getUpdates"),
+              NetworkError("reset"), [3], InvalidToken()]
+    bot, router = run_poll(script, monkeypatch)
+    assert router.routed == [1, 2, 3]
+    assert bot.calls == 6
+
+
+def test_poll_stops_on_invalid_token(monkeypatch):
+    bot, router = run_poll([InvalidToken()], monkeypatch)
+    assert bot.calls == 1
+    assert router.routed == []
@@ -0,0 +1,117 @@
+import asyncio
+
+from timers import TimerWheel
+
+
+def test_timers_fire_in_deadline_order():
+    async def run():
+        wheel = TimerWheel(tick=0.01, size=64)
+        fired = []
+        wheel.schedule(0.05, fired.append, "late")
+        wheel.schedule(0.01, fired.append, "early")
+        await asyncio.sleep(0.15)
+        await wheel.close()
+        return fired, len(wheel)
+
+    fired, pending = asyncio.run(run())
+    assert fired == ["early", "late"]
+    assert pending == 0
+
+
+def test_cancelled_timer_never_fires():
+    async def run():
+        wheel = TimerWheel(tick=0.01, size=64)
+        fired = []
+        timer = wheel.schedule(0.03, fired.append, "x")
+        assert timer.active and len(wheel) == 1
+        timer.cancel()
+        timer.cancel()  # a second cancel is harmless
+        assert not timer.active and len(wheel) == 0
+        await asyncio.sleep(0.08)
+        await wheel.close()
+        return fired
+
+    assert asyncio.run(run()) == []
+
+
+def test_reschedule_moves_the_deadline():
+    async def run():
+        wheel = TimerWheel(tick=0.01, size=64)
+        loop = asyncio.get_running_loop()
+        fired = []
+        timer = wheel.schedule(0.02, lambda: fired.append(loop.time()))
+        start = loop.time()
+        timer.reschedule(0.12)
+        assert len(wheel) == 1
+        await asyncio.sleep(0.06)
+        early = list(fired)
+        await asyncio.sleep(0.15)
+        await wheel.close()
+        return early, [t - start for t in fired]
+
+    early, fired = asyncio.run(run())
+    assert early == []
+    assert len(fired) == 1 and fired[0] >= 0.12
+
+
+def test_deadlines_beyond_one_turn_of_the_wheel_wait_their_rounds():
+    async def run():
+        # The wheel turns every 0.08s, so 0.2s is two and a half turns
+        wheel = TimerWheel(tick=0.01, size=8)
+        loop = asyncio.get_running_loop()
+        fired = []
+        start = loop.time()
+        timer = wheel.schedule(0.2, lambda: fired.append(loop.time() - start))
+        assert timer.rounds == 2
+        await asyncio.sleep(0.12)
+        early = list(fired)
+        await asyncio.sleep(0.2)
+        await wheel.close()
+        return early, fired
+
+    early, fired = asyncio.run(run())
+    assert early == []
+    assert len(fired) == 1 and 0.2 <= fired[0] < 0.3
+
+
+def test_idle_wheel_wakes_for_a_new_timer():
+    async def run():
+        wheel = TimerWheel(tick=0.01, size=64)
+        fired = []
+        wheel.schedule(0.01, fired.append, 1)
+        await asyncio.sleep(0.1)
+        # Empty now, the wheel task waits until something is scheduled
+        assert len(wheel) == 0
+        await asyncio.sleep(0.1)
+        wheel.schedule(0.02, fired.append, 2)
+        await asyncio.sleep(0.1)
+        await wheel.close()
+        return fired
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_coroutine_callbacks_and_failures():
+    async def run():
+        wheel = TimerWheel(tick=0.01, size=64)
+        fired = []
+
+        async def later(value):
+            fired.append(value)
+
+        def broken():
+            raise ValueError("boom")
+
+        async def broken_later():
+            raise ValueError("boom")
+
+        wheel.schedule(0.01, broken)
+        wheel.schedule(0.01, broken_later)
+        wheel.schedule(0.01, later, "a")
+        wheel.schedule(0.01, later, "b")
+        await asyncio.sleep(0.08)
+        await wheel.close()
+        return fired
+
+    # A failing callback is logged and doesn't stop the others
+    assert sorted(asyncio.run(run())) == ["a", "b"]
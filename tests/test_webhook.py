@@ -0,0 +1,71 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, WebhookServer
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 7,
+        "date": 0,
+        "chat": {"id": -100, "type": "group"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Ann"},
+        "text": "apple",
+    },
+}
+
+
+def post(body, secret="", headers=None, data=None):
+    """POST one request to a fresh server; returns (status, updates handled)."""
+    handled = []
+
+    async def process(update):
+        handled.append(update)
+
+    async def run():
+        server = WebhookServer(None, process, "/telegram", secret=secret)
+        async with TestClient(TestServer(server.make_app())) as client:
+            if data is not None:
+                response = await client.post("/telegram", data=data, headers=headers)
+            else:
+                response = await client.post("/telegram", json=body, headers=headers)
+            await server.drain()
+            return response.status
+
+    return asyncio.run(run()), handled
+
+
+def test_update_is_processed():
+    status, handled = post(UPDATE)
+    assert status == 200
+    assert [u.update_id for u in handled] == [1]
+    assert handled[0].message.text == "apple"
+
+
+def test_bad_json_is_rejected():
+    status, handled = post(None, data=b"{not json", headers={"Content-Type": "application/json"})
+    assert status == 400
+    assert handled == []
+
+
+def test_json_that_is_not_an_object_is_rejected():
+    for body in ([], 1, "update", [UPDATE]):
+        status, handled = post(body)
+        assert status == 400, body
+        assert handled == []
+
+
+def test_object_that_is_not_an_update_is_rejected():
+    for body in ({}, {"update_id": 1, "message": 5}):
+        status, handled = post(body)
+        assert status == 400, body
+        assert handled == []
+
+
+def test_wrong_secret_is_forbidden():
+    status, handled = post(UPDATE, secret="s3cret", headers={SECRET_HEADER: "guess"})
+    assert status == 403
+    assert handled == []
+    status, handled = post(UPDATE, secret="s3cret", headers={SECRET_HEADER: "s3cret"})
+    assert status == 200
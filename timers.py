@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ('wheel', 'deadline', 'callback', 'args', 'slot', 'rounds')
+
+    def __init__(self, wheel, deadline, callback, args):
+        self.wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.slot = None
+        self.rounds = 0
+
+    @property
+    def active(self):
+        return self.slot is not None
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        if self.slot is not None:
+            self.wheel._remove(self)
+
+    def reschedule(self, delay):
+        self.cancel()
+        self.deadline = time.monotonic() + delay
+        self.wheel._insert(self)
+
+
+class TimerWheel:
+    """Hashed timing wheel for every deadline in the bot.
+
+    Scheduling, cancelling and rescheduling are O(1): a timer is put in the
+    slot its deadline falls on, with a count of how many full turns of the
+    wheel to wait first. One task advances the wheel every ``tick`` seconds
+    and fires everything due in that step as a batch; coroutine callbacks
+    of a batch run together in a single task. Deadlines are rounded up to
+    the next tick.
+    """
+
+    def __init__(self, tick=0.1, size=1024):
+        self.tick = tick
+        self.size = size
+        self._slots = [{} for _ in range(size)]
+        self._cursor = 0  # next slot to expire
+        self._time = 0.0  # when the cursor slot is due
+        self._count = 0
+        self._task = None
+        self._wakeup = None
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, delay, callback, *args):
+        """Call ``callback(*args)`` after ``delay`` seconds."""
+        timer = Timer(self, time.monotonic() + delay, callback, args)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if not self._count:
+            self._time = time.monotonic()
+            self._wakeup.set()
+        ticks = max(0, math.ceil((timer.deadline - self._time) / self.tick))
+        timer.rounds, offset = divmod(ticks, self.size)
+        timer.slot = (self._cursor + offset) % self.size
+        self._slots[timer.slot][timer] = None
+        self._count += 1
+
+    def _remove(self, timer):
+        del self._slots[timer.slot][timer]
+        timer.slot = None
+        self._count -= 1
+
+    def _advance(self):
+        due = []
+        slot = self._slots[self._cursor]
+        for timer in list(slot):
+            if timer.rounds:
+                timer.rounds -= 1
+            else:
+                self._remove(timer)
+                due.append(timer)
+        self._cursor = (self._cursor + 1) % self.size
+        self._time += self.tick
+        return due
+
+    async def _run(self):
+        while True:
+            if not self._count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._time - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            # Catch up on every slot that is due, then fire them together
+            due = []
+            while self._count and self._time <= time.monotonic():
+                due.extend(self._advance())
+            if due:
+                self._fire(due)
+
+    def _fire(self, due):
+        coros = []
+        for timer in due:
+            try:
+                result = timer.callback(*timer.args)
+            except Exception:
+                logger.exception("Timer callback %r failed", timer.callback)
+                continue
+            if asyncio.iscoroutine(result):
+                coros.append(result)
+        if coros:
+            asyncio.get_running_loop().create_task(self._gather(coros))
+
+    async def _gather(self, coros):
+        for result in await asyncio.gather(*coros, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error("Timer callback failed", exc_info=result)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,121 @@
+import asyncio
+import hmac
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+import config
+from chatlocks import OrderedTasks
+from metrics import call_api
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Accepts updates POSTed by Telegram and hands them to ``process``.
+
+    Every update is handled in its own task, so chats are processed
+    concurrently, while updates of the same chat run one at a time in the
+    order they arrived. At most ``max_pending`` updates are queued or
+    running; past that a request waits up to ``backpressure_timeout``
+    seconds for room (holding Telegram's connection open) and then gets a
+    503, which Telegram retries later.
+    """
+
+    def __init__(self, bot, process, path, secret="", max_pending=1000, backpressure_timeout=5.0):
+        self.bot = bot
+        self.process = process
+        self.path = path
+        self.secret = secret
+        self.backpressure_timeout = backpressure_timeout
+        self._tasks = OrderedTasks(max_pending)
+
+    @property
+    def pending(self):
+        return self._tasks.pending
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request):
+        token = request.headers.get(SECRET_HEADER, "")
+        if self.secret and not hmac.compare_digest(token, self.secret):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise ValueError("update is not a JSON object")
+            update = Update.de_json(data, self.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            # Not JSON, or JSON that isn't an Update
+            return web.Response(status=400)
+
+        chat = update.effective_chat
+        key = chat.id if chat else ('update', update.update_id)
+        if not await self._tasks.submit(key, self.process, update, timeout=self.backpressure_timeout):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def drain(self):
+        await self._tasks.drain()
+
+
+def make_server(bot, process):
+    if not config.WEBHOOK_SECRET:
+        print("WEBHOOK_SECRET is not set; accepting updates from anyone")
+    return WebhookServer(
+        bot,
+        process,
+        config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET,
+        max_pending=config.WEBHOOK_MAX_PENDING,
+        backpressure_timeout=config.WEBHOOK_BACKPRESSURE_TIMEOUT,
+    )
+
+
+async def listen(server):
+    """Start serving ``server`` and register the webhook; returns the aiohttp runner."""
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, config.WEBHOOK_LISTEN, config.WEBHOOK_PORT).start()
+    if config.WEBHOOK_URL:
+        await call_api("setWebhook", server.bot.set_webhook(
+            config.WEBHOOK_URL,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+        ))
+    print(f"Listening for updates on {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    return runner
+
+
+async def wait_for_signal():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def run_webhook(application):
+    server = make_server(application.bot, application.process_update)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    runner = await listen(server)
+    try:
+        await wait_for_signal()
+    finally:
+        await runner.cleanup()
+        await server.drain()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)